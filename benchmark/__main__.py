@@ -0,0 +1,63 @@
+"""
+Run the benchmark suite and write the results as JSON. From the repository root:
+
+    python -m benchmark [--quick] [--output results.json] [suite ...]
+
+where suite is any of mechanics, gravity, optics, rendering (all by default). The JSON document holds the
+environment of the run and one record per measure, so that results of different versions can be compared.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+suites = ["mechanics", "gravity", "optics", "rendering"]
+
+
+def get_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the performance benchmarks")
+    parser.add_argument("suites", nargs="*", metavar="suite", help="one of " + ", ".join(suites))
+    parser.add_argument("--quick", action="store_true", help="only run the small sizes")
+    parser.add_argument("--output", help="file where the results are written, standard output by default")
+    args = parser.parse_args()
+    for suite in args.suites:
+        if suite not in suites:
+            parser.error("unknown suite {}".format(suite))
+
+    results = []
+    for suite in args.suites or suites:
+        print("Running {} benchmarks".format(suite), file=sys.stderr)
+        results.extend(importlib.import_module("benchmark." + suite).run(args.quick))
+
+    document = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results,
+    }
+
+    text = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
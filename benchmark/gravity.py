@@ -0,0 +1,72 @@
+"""
+Benchmark of the Barnes-Hut mutual gravity. Run alone from the repository root with: python -m benchmark.gravity
+
+For each number of bodies, measures the time of one force evaluation and this time divided by n log2(n), which stays
+roughly constant when the evaluation scales in O(n log n). The direct O(n^2) sum is timed for comparison on small
+sizes.
+"""
+import math
+import sys
+from typing import List
+
+import numpy as np
+
+from benchmark.timing import time_per_call
+from src.physics.gravity import MutualGravity
+
+dim = (1000, 1000)
+sizes = [10 ** 3, 3 * 10 ** 3, 10 ** 4, 3 * 10 ** 4, 10 ** 5]
+quick_sizes = [10 ** 3, 3 * 10 ** 3, 10 ** 4]
+max_direct_size = 3 * 10 ** 3
+
+
+def direct_sum(r: np.ndarray, m: np.ndarray, g: float, softening: float) -> np.ndarray:
+    d = r[np.newaxis, :, :] - r[:, np.newaxis, :]
+    k = g * m[np.newaxis, :] / (np.einsum("ijk,ijk->ij", d, d) + softening ** 2) ** 1.5
+    np.fill_diagonal(k, 0.)
+    return np.einsum("ij,ijk->ik", k, d) * m[:, np.newaxis]
+
+
+def run(quick: bool = False, custom_sizes: List[int] = None) -> List[dict]:
+    rng = np.random.default_rng(0)
+
+    results = []
+    for n in custom_sizes or (quick_sizes if quick else sizes):
+        r = rng.uniform(0, dim[0], (n, 2))
+        v = np.zeros_like(r)
+        m = np.ones(n)
+        gravity = MutualGravity(dim)
+
+        t = time_per_call(lambda: gravity.apply_on_batch(r, v, m), max_calls=10)
+        result = {
+            "benchmark": "gravity.barnes_hut",
+            "n_particles": n,
+            "theta": gravity.theta,
+            "evaluation_s": t,
+            "ns_per_n_log_n": t / (n * math.log2(n)) * 1e9,
+        }
+
+        if n <= max_direct_size:
+            f_bh = gravity.apply_on_batch(r, v, m)
+            f_direct = direct_sum(r, m, gravity.g, gravity.softening)
+            result["direct_evaluation_s"] = time_per_call(lambda: direct_sum(r, m, gravity.g, gravity.softening),
+                                                          max_calls=10)
+            result["median_relative_error"] = float(np.median(
+                np.linalg.norm(f_bh - f_direct, axis=1) / np.linalg.norm(f_direct, axis=1)))
+
+        results.append(result)
+    return results
+
+
+def main(custom_sizes: List[int]):
+    print("{:>8} {:>12} {:>16} {:>12} {:>12}".format("n", "bh (s)", "bh/nlogn (ns)", "direct (s)", "rel. error"))
+    for result in run(custom_sizes=custom_sizes):
+        line = "{:>8} {:>12.4f} {:>16.1f}".format(result["n_particles"], result["evaluation_s"],
+                                                 result["ns_per_n_log_n"])
+        if "direct_evaluation_s" in result:
+            line += " {:>12.4f} {:>12.2e}".format(result["direct_evaluation_s"], result["median_relative_error"])
+        print(line)
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]])
@@ -0,0 +1,82 @@
+"""
+Benchmark of the mechanics step, without optics: ballistic and central force scenes from 10^2 to 10^6 particles, and
+an emitter scene where particles constantly leave the world and are spawned again.
+"""
+from typing import List
+
+import numpy as np
+
+from benchmark.timing import time_per_call
+from src.mathematics import Vector
+from src.physics.mechanics import CentralForce, ConstantForce
+from src.physics.world import World
+
+dim = (2000, 2000)
+dt = 1 / 120
+sizes = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]
+quick_sizes = [10 ** 2, 10 ** 3, 10 ** 4]
+
+
+def make_world(n_particles: int) -> World:
+    rng = np.random.default_rng(0)
+    w = World(dim)
+    w.is_removed_if_out_of_world = False  # keeps the number of particles constant during the measure
+    w.spawn(rng.uniform(0, dim, (n_particles, 2)), rng.uniform(-100, 100, (n_particles, 2)))
+    return w
+
+
+def make_emitter_step(n_particles: int):
+    """
+    Return a step of a scene where particles are spawned at the center of the world and removed when leaving it. The
+    particles live about a second, so that about as many particles are spawned as removed at each step.
+    """
+    rng = np.random.default_rng(0)
+    w = World(dim)
+    speed = dim[0] / 2
+    n_spawned = max(1, int(n_particles * dt))
+
+    def spawn(n):
+        angles = rng.uniform(0, 2 * np.pi, n)
+        speeds = rng.uniform(0.5 * speed, speed, n)
+        w.spawn(np.full((n, 2), dim[0] / 2), np.stack([np.cos(angles), np.sin(angles)], axis=1) * speeds[:, None])
+
+    spawn(n_particles)
+    for _ in range(int(1 / dt)):
+        w.update(dt)
+        spawn(n_spawned)
+
+    def step():
+        w.update(dt)
+        spawn(n_spawned)
+
+    return w, step
+
+
+def run(quick: bool = False) -> List[dict]:
+    scenes = {
+        "ballistic": [ConstantForce(Vector(0, -10.))],
+        "central": [CentralForce(Vector(dim[0] / 2, dim[1] / 2), 10000.)],
+    }
+
+    results = []
+    for n in quick_sizes if quick else sizes:
+        w = make_world(n)
+        for scene, forces in scenes.items():
+            w.forces = forces
+            t = time_per_call(lambda: w.update(dt), max_calls=10000)
+            results.append({
+                "benchmark": "mechanics.{}".format(scene),
+                "n_particles": n,
+                "steps_per_second": 1 / t,
+                "ns_per_particle_step": t / n * 1e9,
+            })
+
+        w, step = make_emitter_step(n)
+        t = time_per_call(step, max_calls=10000)
+        results.append({
+            "benchmark": "mechanics.emitter",
+            "n_particles": len(w.store),
+            "steps_per_second": 1 / t,
+            "ns_per_particle_step": t / len(w.store) * 1e9,
+        })
+    return results
@@ -0,0 +1,73 @@
+"""
+Benchmark of the ray emission: throughput of RayEmitter.emit, one emitter at a time, and RayEmitter.emit_from, all
+emitters at once, against the number of mirrors in the scene.
+"""
+import math
+import random
+from typing import List
+
+import numpy as np
+
+from benchmark.timing import time_per_call
+from src.mathematics import Segment, Vector
+from src.physics.mechanics import Particle
+from src.physics.optics import PlaneMirror, RayBundle, RayEmitter
+
+dim = (2000, 2000)
+n_emitters = 10
+mirror_counts = [0, 1, 4, 16, 64, 256, 1024, 4096]
+quick_mirror_counts = [0, 4, 16]
+max_mirror_length = 200
+
+
+def make_mirrors(n_mirrors: int) -> List[PlaneMirror]:
+    # mirrors get shorter as they get more numerous, so that the scene keeps a similar density
+    mirror_length = min(max_mirror_length, dim[0] / (2 * math.sqrt(max(n_mirrors, 1))))
+    mirrors = []
+    for _ in range(n_mirrors):
+        x, y = random.uniform(0, dim[0]), random.uniform(0, dim[1])
+        angle = random.uniform(0, math.pi)
+        dx, dy = math.cos(angle) * mirror_length / 2, math.sin(angle) * mirror_length / 2
+        mirrors.append(PlaneMirror(Segment((x - dx, y - dy), (x + dx, y + dy))))
+    return mirrors
+
+
+def make_emitters() -> List[Particle]:
+    return [Particle(Vector(random.uniform(0, dim[0]), random.uniform(0, dim[1])), Vector(), 1.)
+            for _ in range(n_emitters)]
+
+
+def run(quick: bool = False) -> List[dict]:
+    results = []
+    for n_mirrors in quick_mirror_counts if quick else mirror_counts:
+        random.seed(0)
+        mirrors = make_mirrors(n_mirrors)
+        emitters = make_emitters()
+        emitter = RayEmitter(*dim)
+
+        rays = RayBundle.concatenate([emitter.emit(p, mirrors) for p in emitters])
+        n_segments = rays.n_segments
+
+        t = time_per_call(lambda: [emitter.emit(p, mirrors) for p in emitters])
+        results.append({
+            "benchmark": "optics.emit",
+            "n_mirrors": n_mirrors,
+            "n_emitters": n_emitters,
+            "emits_per_second": n_emitters / t,
+            "rays_per_second": len(rays) / t,
+            "segments_per_ray": n_segments / len(rays),
+            "segments_per_second": n_segments / t,
+        })
+
+        positions = np.array([[p.r.x, p.r.y] for p in emitters])
+        t = time_per_call(lambda: emitter.emit_from(positions, mirrors))
+        results.append({
+            "benchmark": "optics.emit_from",
+            "n_mirrors": n_mirrors,
+            "n_emitters": n_emitters,
+            "emits_per_second": n_emitters / t,
+            "rays_per_second": len(rays) / t,
+            "segments_per_ray": n_segments / len(rays),
+            "segments_per_second": n_segments / t,
+        })
+    return results
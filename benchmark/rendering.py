@@ -0,0 +1,74 @@
+"""
+Benchmark of the rendering: frame times of Viewer.draw and Plotter.draw on an offscreen display.
+"""
+import os
+from typing import List
+
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from benchmark.optics import make_mirrors
+from benchmark.timing import time_per_call
+from src.mathematics import Vector
+from src.physics.mechanics import CentralForce
+from src.physics.world import World
+from src.window import Window
+
+dim = (2000, 2000)
+dt = 1 / 120
+particle_counts = [1, 10, 100, 10 ** 3, 10 ** 4, 10 ** 5]
+quick_particle_counts = [1, 100, 10 ** 3, 10 ** 4]
+n_mirrors = 8
+n_history_frames = 1000
+
+
+def make_world(n_particles: int) -> World:
+    rng = np.random.default_rng(0)
+    w = World(dim)
+    w.is_removed_if_out_of_world = False
+    w.forces.append(CentralForce(Vector(dim[0] / 2, dim[1] / 2), 10000.))
+    w.spawn(rng.uniform(0, dim, (n_particles, 2)), rng.uniform(-100, 100, (n_particles, 2)))
+    w.mirrors.extend(make_mirrors(n_mirrors))
+    return w
+
+
+def run(quick: bool = False) -> List[dict]:
+    window = Window()
+
+    results = []
+    for n in quick_particle_counts if quick else particle_counts:
+        w = make_world(n)
+        window.plotter.reset()
+
+        # fill the plot history as a running simulation would
+        for _ in range(n_history_frames):
+            w.update(dt)
+            entities = window._get_entities(w)
+            window.plotter.update(w, entities[0], entities[min(1, len(entities) - 1)])
+        w.update(dt)
+
+        entities = window._get_entities(w)
+        selected_index = min(1, len(entities) - 1)
+        world_entity, selected = entities[0], entities[selected_index]
+
+        # the rays are memoized until the particles move, so the world is advanced out of the measure before each
+        # call, as in a running simulation: the frame time includes the tracing, also reported alone
+        def advance():
+            w.update(dt)
+
+        t_viewer = time_per_call(lambda: window.viewer.draw(w, world_entity, selected), setup=advance)
+        t_trace = time_per_call(lambda: w.rays, setup=advance)
+        t_plotter = time_per_call(lambda: window.plotter.draw(entities, selected_index))
+        t_update = time_per_call(lambda: window.plotter.update(w, world_entity, selected))
+        results.append({
+            "benchmark": "rendering.frame",
+            "n_particles": n,
+            "n_mirrors": n_mirrors,
+            "n_rays": len(w.rays),
+            "viewer_draw_ms": t_viewer * 1e3,
+            "trace_ms": t_trace * 1e3,
+            "plotter_draw_ms": t_plotter * 1e3,
+            "plotter_update_ms": t_update * 1e3,
+        })
+    return results
@@ -0,0 +1,25 @@
+import time
+from typing import Callable
+
+
+def time_per_call(f: Callable[[], None], min_duration: float = 0.2, max_calls: int = 1000,
+                  setup: Callable[[], None] = None) -> float:
+    """
+    Return the mean duration of a call of f in seconds. f is called until min_duration is spent or max_calls is
+    reached, after a first warm up call which is not counted.
+    :param setup: if given, called before each call of f, out of the measure
+    """
+    if setup is not None:
+        setup()
+    f()
+
+    n_calls = 0
+    elapsed = 0.
+    while elapsed < min_duration and n_calls < max_calls:
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        f()
+        elapsed += time.perf_counter() - t0
+        n_calls += 1
+    return elapsed / n_calls
@@ -0,0 +1,224 @@
+import glob
+import importlib
+import json
+import os
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+from src.mathematics import Segment, Vector
+from src.physics.mechanics import Particle
+from src.physics.optics import PlaneMirror
+from src.physics.world import World
+
+magic = b"PSRWORLD"
+format_version = 1
+alignment = 64  # arrays start at multiples of this offset in the file
+
+_preamble = struct.Struct("<8sII")  # magic, version, size of the header
+_arrays = ("id", "r", "r_previous", "v", "a", "m", "t")  # arrays of the particle store saved
+
+
+def save(world: World, path: str) -> None:
+    """
+    Save the state of a world to a binary checkpoint: a preamble with the format version, a JSON header describing the
+    world and its arrays, then the arrays themselves. The file is written aside and moved in place, so that an
+    interruption never leaves a truncated checkpoint.
+    :param world: world to be saved
+    :param path: path of the checkpoint
+    """
+    store = world.store
+    arrays = {name: np.ascontiguousarray(getattr(store, "ids" if name == "id" else name)) for name in _arrays}
+    arrays["mirrors"] = np.array([[m.segment.x0(), m.segment.y0(), m.segment.x1(), m.segment.y1()]
+                                  for m in world.mirrors], dtype=float).reshape(-1, 4)
+
+    header = {
+        "dim": [world.rect.w, world.rect.h],
+        "t": world.t,
+        "is_removed_if_out_of_world": world.is_removed_if_out_of_world,
+        "is_acceleration_current": store.is_acceleration_current,
+        "integrator": _encode(world.integrator),
+        "forces": [_encode(force) for force in world.forces],
+        "arrays": {},
+    }
+
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    payload_start = _align(_preamble.size + len(header_bytes))
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(_preamble.pack(magic, format_version, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(payload_start + header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def load(path: str) -> World:
+    """
+    Rebuild a world from a checkpoint. Loading the same checkpoint several times gives independent worlds, e.g. to
+    run variants of a scenario from a common state.
+
+    Checkpoints must come from a trusted source: the integrator and forces are rebuilt by importing the classes named
+    in the file, as unpickling would.
+    :param path: path of the checkpoint
+    """
+    with open(path, "rb") as f:
+        file_magic, version, header_size = _preamble.unpack(f.read(_preamble.size))
+        if file_magic != magic:
+            raise ValueError("{} is not a world checkpoint".format(path))
+        if version > format_version:
+            raise ValueError("Checkpoint version {} is not supported, expected at most {}".format(
+                version, format_version))
+
+        header = json.loads(f.read(header_size).decode("utf-8"))
+        payload_start = _align(_preamble.size + header_size)
+
+        arrays = {}
+        for name, description in header["arrays"].items():
+            dtype, shape = np.dtype(description["dtype"]), tuple(description["shape"])
+            f.seek(payload_start + description["offset"])
+            arrays[name] = np.fromfile(f, dtype, int(np.prod(shape))).reshape(shape)
+
+    world = World(tuple(header["dim"]), _decode(header["integrator"]))
+    world.t = header["t"]
+    world.is_removed_if_out_of_world = header["is_removed_if_out_of_world"]
+    world.forces = [_decode(force) for force in header["forces"]]
+    world.mirrors = [PlaneMirror(Segment((x0, y0), (x1, y1))) for x0, y0, x1, y1 in arrays["mirrors"].tolist()]
+
+    store = world.store
+    store.spawn(arrays["r"], arrays["v"], arrays["m"], ids=arrays["id"])
+    store.r_previous[:] = arrays["r_previous"]
+    store.a[:] = arrays["a"]
+    store.t[:] = arrays["t"]
+    store.is_acceleration_current = header["is_acceleration_current"]
+    if len(store):
+        Particle._next_id = max(Particle._next_id, int(store.ids.max()) + 1)
+
+    return world
+
+
+class Checkpointer:
+    """
+    Class saving checkpoints of a world every few steps, to be appended to the recorders of the world. Only the last
+    checkpoints of the directory are kept, including those saved by previous runs.
+    """
+
+    def __init__(self, directory: str, every: int = 10000, keep: int = 2):
+        """
+        :param directory: directory of the checkpoints, created if needed
+        :param every: number of steps between two checkpoints
+        :param keep: number of checkpoints kept
+        """
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.n_steps = 0  # number of steps seen
+
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, world: World) -> None:
+        """ Called after each step of the world, saves a checkpoint every few steps """
+        self.n_steps += 1
+        if self.n_steps % self.every:
+            return
+
+        path = os.path.join(self.directory, "checkpoint_{:020d}.ckpt".format(int(round(world.t * 1e6))))
+        save(world, path)
+        paths = _get_paths(self.directory)
+        for old_path in paths[:max(0, len(paths) - self.keep)]:
+            os.remove(old_path)
+
+
+def latest(directory: str) -> Optional[str]:
+    """ Return the path of the checkpoint of a directory saved by a Checkpointer at the latest time, None if none """
+    paths = _get_paths(directory)
+    return paths[-1] if paths else None
+
+
+def _get_paths(directory: str) -> List[str]:
+    """ Return the paths of the checkpoints of a directory saved by a Checkpointer, by increasing time """
+    paths = glob.glob(os.path.join(directory, "checkpoint_*.ckpt"))
+    return sorted(paths, key=lambda path: int(os.path.basename(path)[len("checkpoint_"):-len(".ckpt")]))
+
+
+def _align(offset: int) -> int:
+    return -(-offset // alignment) * alignment
+
+
+def _encode(value):
+    """ Encode a value as JSON, objects being encoded with their class and the state they would be pickled with """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        return value.item()
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": {str(k): _encode(v) for k, v in value.items()}}
+    if isinstance(value, Vector):
+        return {"vector": [value.x, value.y]}
+    if isinstance(value, np.ndarray):
+        return {"array": value.tolist(), "dtype": value.dtype.str}
+
+    cls = type(value)
+    state = value.__getstate__() if hasattr(value, "__getstate__") else _get_default_state(value)
+    return {"object": "{}:{}".format(cls.__module__, cls.__qualname__), "state": _encode(state)}
+
+
+def _get_default_state(value):
+    """
+    Return the state an object is pickled with by default, as object.__getstate__ does since python 3.11: its
+    __dict__, or a pair of its __dict__ and a dict of its slots if it has slots
+    """
+    slots = {}
+    for cls in type(value).__mro__:
+        names = cls.__dict__.get("__slots__", ())
+        for name in [names] if isinstance(names, str) else names:
+            if name not in ("__dict__", "__weakref__") and hasattr(value, name):
+                slots[name] = getattr(value, name)
+    state = getattr(value, "__dict__", None) or None
+    return (state, slots) if slots else state
+
+
+def _decode(value):
+    """ Decode a value encoded by _encode, importing the module of each object: only decode trusted checkpoints """
+    if not isinstance(value, dict):
+        return [_decode(v) for v in value] if isinstance(value, list) else value
+    if "tuple" in value:
+        return tuple(_decode(v) for v in value["tuple"])
+    if "dict" in value:
+        return {k: _decode(v) for k, v in value["dict"].items()}
+    if "vector" in value:
+        return Vector(*value["vector"])
+    if "array" in value:
+        return np.array(value["array"], dtype=value["dtype"])
+
+    module, name = value["object"].split(":")
+    cls = getattr(importlib.import_module(module), name)
+    obj = cls.__new__(cls)
+    state = _decode(value["state"])
+    if hasattr(obj, "__setstate__"):
+        obj.__setstate__(state)
+    else:
+        _set_default_state(obj, state)
+    return obj
+
+
+def _set_default_state(obj, state) -> None:
+    """ Restore a state returned by _get_default_state or object.__getstate__, as unpickling does """
+    slots = None
+    if isinstance(state, tuple) and len(state) == 2:
+        state, slots = state
+    if state:
+        obj.__dict__.update(state)
+    for name, value in (slots or {}).items():
+        setattr(obj, name, value)
@@ -0,0 +1,49 @@
+from typing import Any, Callable, List, Optional
+
+from src.physics.world import World
+
+
+class HeadlessSimulation:
+    """
+    Class running a world as fast as possible, without any window nor rendering. The world is evolved with a fixed
+    time step, and observables can be sampled along the way with a callback.
+    """
+
+    def __init__(self, world: World, dt: float = 1 / 120):
+        """
+        :param world: world to be simulated
+        :param dt: physics time step in seconds
+        """
+        self.world = world
+        self.dt = dt
+        self.n_steps = 0  # number of steps computed since creation
+
+    def run(self,
+            n_steps: Optional[int] = None,
+            duration: Optional[float] = None,
+            callback: Optional[Callable[[World], Any]] = None,
+            sample_every: int = 1
+            ) -> List[Any]:
+        """
+        Evolve the world for a number of steps or a duration, whichever is given
+        :param n_steps: number of steps to compute
+        :param duration: simulated time in seconds, rounded to a whole number of steps
+        :param callback: function called with the world every sample_every steps
+        :param sample_every: number of steps between two calls of the callback
+        :return: values returned by the callback, in order
+        """
+        if n_steps is None and duration is None:
+            raise ValueError("Either n_steps or duration must be given")
+
+        if n_steps is None:
+            n_steps = int(round(duration / self.dt))
+
+        samples = []
+        for i in range(1, n_steps + 1):
+            self.world.update(self.dt)
+            self.n_steps += 1
+
+            if callback is not None and i % sample_every == 0:
+                samples.append(callback(self.world))
+
+        return samples
@@ -0,0 +1,206 @@
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Class holding the last values of a quantity in a preallocated array, the oldest value being overwritten once
+    full. The minimum and maximum of the values held are kept up to date with monotonic queues, so that appending and
+    reading them costs O(1) amortized.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.n = 0  # number of values appended since creation
+        self._values = np.zeros(capacity)
+
+        # values which can still become the minimum or maximum with their index, increasing in _minima and
+        # decreasing in _maxima
+        self._minima = deque()
+        self._maxima = deque()
+
+    def __len__(self):
+        return min(self.n, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes
+
+    def append(self, value: float) -> None:
+        self._values[self.n % self.capacity] = value
+
+        while self._minima and self._minima[-1][1] >= value:
+            self._minima.pop()
+        self._minima.append((self.n, value))
+        while self._maxima and self._maxima[-1][1] <= value:
+            self._maxima.pop()
+        self._maxima.append((self.n, value))
+
+        self.n += 1
+        oldest = self.n - self.capacity
+        if self._minima[0][0] < oldest:
+            self._minima.popleft()
+        if self._maxima[0][0] < oldest:
+            self._maxima.popleft()
+
+    def min(self) -> float:
+        return self._minima[0][1]
+
+    def max(self) -> float:
+        return self._maxima[0][1]
+
+    def values(self) -> np.ndarray:
+        """ Return the values held, oldest first """
+        if self.n <= self.capacity:
+            return self._values[:self.n]
+        i = self.n % self.capacity
+        return np.concatenate([self._values[i:], self._values[:i]])
+
+
+class TieredBuffer:
+    """
+    Class holding the history of a quantity over a whole run in a bounded memory. The last values are kept at full
+    resolution, older ones as the minimum and maximum of blocks of values, coarser and coarser with age: level i keeps
+    the last capacity blocks of factor ** i values, so that the levels cover capacity * factor ** (max_levels - 1)
+    values. Levels are created when first needed.
+    """
+
+    def __init__(self, capacity: int = 1000, factor: int = 4, max_levels: int = 12):
+        """
+        :param capacity: number of blocks kept by each level
+        :param factor: number of blocks of a level merged in a block of the next level
+        :param max_levels: number of levels, the oldest blocks of the last level being dropped
+        """
+        if capacity < factor:
+            raise ValueError("The capacity {} must be at least the factor {}".format(capacity, factor))
+
+        self.capacity = capacity
+        self.factor = factor
+        self.max_levels = max_levels
+        self.n = 0  # number of values appended since creation
+
+        values = RingBuffer(capacity)
+        self.levels: List[Tuple[RingBuffer, RingBuffer]] = [(values, values)]  # minima and maxima of each level
+        self._pending = [[math.inf, -math.inf, 0]]  # minimum, maximum and size of the block being merged by level
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def nbytes(self) -> int:
+        return self.levels[0][0].nbytes + sum(lo.nbytes + hi.nbytes for lo, hi in self.levels[1:])
+
+    @property
+    def max_nbytes(self) -> int:
+        """ Size the buffer reaches once all its levels are created """
+        return self.levels[0][0].nbytes * (2 * self.max_levels - 1)
+
+    def append(self, value: float) -> None:
+        self.levels[0][0].append(value)
+        self.n += 1
+
+        lo, hi = value, value
+        level = 0
+        while level < self.max_levels - 1:
+            pending = self._pending[level]
+            pending[0], pending[1], pending[2] = min(pending[0], lo), max(pending[1], hi), pending[2] + 1
+            if pending[2] < self.factor:
+                return
+
+            lo, hi = pending[0], pending[1]
+            self._pending[level] = [math.inf, -math.inf, 0]
+            level += 1
+
+            if level == len(self.levels):
+                self.levels.append((RingBuffer(self.capacity), RingBuffer(self.capacity)))
+                self._pending.append([math.inf, -math.inf, 0])
+            self.levels[level][0].append(lo)
+            self.levels[level][1].append(hi)
+
+    def min(self) -> float:
+        return min(lo.min() for lo, _ in self.levels)
+
+    def max(self) -> float:
+        return max(hi.max() for _, hi in self.levels)
+
+    def envelope(self, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the minima and maxima of consecutive blocks covering the history, oldest first, with about max_points
+        blocks at most: the finest level used is the first one whose blocks cover the history in max_points blocks,
+        older blocks coming from coarser levels, and the last values not yet in a block of the finest level as a last
+        block. Buffers appended together give blocks of the same values.
+        """
+        finest = 0
+        while finest < len(self.levels) - 1 and self.n > max_points * self.factor ** finest:
+            finest += 1
+
+        minima, maxima = [], []
+        covered = 0  # number of values covered by the blocks taken so far
+        for level in range(len(self.levels) - 1, finest - 1, -1):
+            size = self.factor ** level
+            n_blocks = self.n // size
+            first = n_blocks - len(self.levels[level][0])  # index of the first block kept
+
+            if level > finest:
+                finer_size = self.factor ** (level - 1)
+                finer_start = (self.n // finer_size - len(self.levels[level - 1][0])) * finer_size
+                last = -(-finer_start // size)  # blocks overlapping the finer level are taken from this one
+            else:
+                last = n_blocks
+
+            start = max(first, -(-covered // size))
+            if last > start:
+                lo, hi = self.levels[level]
+                minima.append(lo.values()[start - first:last - first])
+                maxima.append(hi.values()[start - first:last - first])
+                covered = last * size
+
+        if covered < self.n:
+            # values appended since the last block of the finest level, merged in the blocks pending below it
+            pending = [p for p in self._pending[:finest] if p[2]]
+            minima.append(np.array([min(p[0] for p in pending)]))
+            maxima.append(np.array([max(p[1] for p in pending)]))
+
+        if not minima:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate(minima), np.concatenate(maxima)
+
+
+class History:
+    """
+    Class holding the history of several quantities sampled together, e.g. the time and the position of an entity
+    """
+
+    def __init__(self, names: Iterable[str], capacity: int, factor: int = 4, max_levels: int = 12):
+        """
+        :param names: names of the quantities
+        :param capacity: number of values or blocks kept by each level of the history, see TieredBuffer
+        :param factor: number of blocks of a level merged in a block of the next level
+        :param max_levels: number of levels of the history
+        """
+        self.buffers: Dict[str, TieredBuffer] = {name: TieredBuffer(capacity, factor, max_levels) for name in names}
+
+    def __getitem__(self, name: str) -> TieredBuffer:
+        return self.buffers[name]
+
+    def __len__(self):
+        return len(next(iter(self.buffers.values())))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+    @property
+    def max_nbytes(self) -> int:
+        return sum(buffer.max_nbytes for buffer in self.buffers.values())
+
+    def append(self, values: Dict[str, float]) -> None:
+        for name, value in values.items():
+            self.buffers[name].append(value)
+
+    def range(self, name: str) -> Tuple[float, float]:
+        buffer = self.buffers[name]
+        return buffer.min(), buffer.max()
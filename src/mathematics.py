@@ -3,12 +3,16 @@ from __future__ import annotations
 import math
 from typing import Tuple, Optional
 
+import numpy as np
+
 epsilon = 0.000001
 
 
 class Vector:
     """ Class representing a 2d Vector"""
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float = 0., y: float = 0.):
         self.x = x
         self.y = y
@@ -48,6 +52,11 @@ class Vector:
         """ Return a vector with opposite direction"""
         return Vector(-self.x, -self.y)
 
+    def reflect(self, normal: Vector) -> Vector:
+        """ Return the vector reflected on a line with the given unit normal vector"""
+        f = 2 * self.dot_product(normal)
+        return Vector(self.x - (f * normal.x), self.y - (f * normal.y))
+
     def scale_to(self, length: float) -> Vector:
         """ Return a vector in same direction scaled to given length"""
         unit_vector = self.unit_vector()
@@ -82,6 +91,26 @@ class Vector:
     def __truediv__(self, other: float):
         return Vector(self.x / other, self.y / other)
 
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, other: float):
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __itruediv__(self, other: float):
+        self.x /= other
+        self.y /= other
+        return self
+
     def __getitem__(self, item):
         if item == 0:
             return self.x
@@ -93,9 +122,11 @@ class Vector:
 class Segment:
     """ Class representing a segment"""
 
+    __slots__ = ("p0", "p1")
+
     def __init__(self, p0: Tuple[float, float], p1: Tuple[float, float]):
-        self.p0 = p0 if p0[0] < p1[0] else p1
-        self.p1 = p1 if p0[0] < p1[0] else p0
+        self.p0 = p0
+        self.p1 = p1
 
     def x0(self) -> float:
         return self.p0[0]
@@ -118,35 +149,36 @@ class Segment:
         b = y1 - (a * x1)
         return a, b
 
-    def intersection_point(self, segment: Segment) -> Optional[Tuple[float, float]]:
-        """ Return the intersection point between the 2 segments"""
-        a1, b1 = self.coefficients()
-        a2, b2 = segment.coefficients()
+    def intersection_parameters(self, segment: Segment) -> Optional[Tuple[float, float]]:
+        """
+        Return the parameters (t, u) of the intersection of the lines of the 2 segments, such that the intersection
+        point is p0 + t * (p1 - p0) on self and p0 + u * (p1 - p0) on segment. Return None if the lines are parallel.
+        """
+        x0, y0 = self.p0
+        ex, ey = self.p1[0] - x0, self.p1[1] - y0
+        fx, fy = segment.p1[0] - segment.p0[0], segment.p1[1] - segment.p0[1]
 
-        if a1 == a2:
+        denominator = (ex * fy) - (ey * fx)
+        if denominator == 0:
             return None
 
-        if a1 == float('inf') or a1 == float('-inf'):
-            x = self.p0[0]
-            y = a2 * x + b2
-
-        elif a2 == float('inf') or a2 == float('-inf'):
-            x = segment.p0[0]
-            y = a1 * x + b1
+        wx, wy = segment.p0[0] - x0, segment.p0[1] - y0
+        t = ((wx * fy) - (wy * fx)) / denominator
+        u = ((wx * ey) - (wy * ex)) / denominator
+        return t, u
 
-        else:
-            x = (b2 - b1) / (a1 - a2)
-            y = ((a2 * b1) - (a1 * b2)) / (a2 - a1)
-
-        min_x = max(min(self.x0(), self.x1()), min(segment.x0(), segment.x1()))
-        max_x = min(max(self.x0(), self.x1()), max(segment.x0(), segment.x1()))
+    def intersection_point(self, segment: Segment) -> Optional[Tuple[float, float]]:
+        """ Return the intersection point between the 2 segments"""
+        parameters = self.intersection_parameters(segment)
+        if parameters is None:
+            return None
 
-        min_y = max(min(self.y0(), self.y1()), min(segment.y0(), segment.y1()))
-        max_y = min(max(self.y0(), self.y1()), max(segment.y0(), segment.y1()))
-        if not min_x - epsilon <= x <= max_x + epsilon or not min_y - epsilon <= y <= max_y + epsilon:
+        t, u = parameters
+        if not -epsilon <= t <= 1 + epsilon or not -epsilon <= u <= 1 + epsilon:
             return None
 
-        return x, y
+        x0, y0 = self.p0
+        return x0 + t * (self.p1[0] - x0), y0 + t * (self.p1[1] - y0)
 
     def colinear_vector(self) -> Vector:
         """ Get a colinear vector to the segment"""
@@ -171,14 +203,113 @@ class Segment:
 
 class DirectedSegment(Segment):
     """
-    Class representing a segment with a direction
+    Class representing a segment with a direction, from its first point to its second point
     """
 
-    def __init__(self, p0: Tuple[float, float], p1: Tuple[float, float]):
-        super().__init__(p0, p1)
-        self.first = p0
-        self.second = p1
+    __slots__ = ()
+
+    @property
+    def first(self) -> Tuple[float, float]:
+        return self.p0
+
+    @property
+    def second(self) -> Tuple[float, float]:
+        return self.p1
 
     def colinear_vector(self) -> Vector:
         """ Get a colinear vector to the segment in the good direction"""
         return Vector(self.second[0] - self.first[0], self.second[1] - self.first[1]).unit_vector()
+
+
+class Rect:
+    """ Class representing an axis aligned rectangle"""
+
+    def __init__(self, p0: Tuple[float, float], dim: Tuple[float, float]):
+        """
+        :param p0: corner of the rectangle with the lowest coordinates
+        :param dim: width and height of the rectangle
+        """
+        self.x, self.y = p0
+        self.w, self.h = dim
+
+    @property
+    def size(self) -> Tuple[float, float]:
+        return self.w, self.h
+
+    def contains(self, p: Tuple[float, float]) -> bool:
+        """ Return whether the point is inside the rectangle, borders included"""
+        return self.x <= p[0] <= self.x + self.w and self.y <= p[1] <= self.y + self.h
+
+
+# Batched versions of the primitives above, working on arrays of vectors of shape (n, 2) or of segments given by their
+# first point p0 and their direction e = p1 - p0. They are used in the hot paths of mechanics and optics.
+
+def dot_products(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """ Return the dot product of each pair of vectors, arrays of shape (..., 2)"""
+    return (u[..., 0] * v[..., 0]) + (u[..., 1] * v[..., 1])
+
+
+def cross_products(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """ Return the cross product of each pair of vectors, arrays of shape (..., 2)"""
+    return (u[..., 0] * v[..., 1]) - (u[..., 1] * v[..., 0])
+
+
+def squared_lengths(u: np.ndarray) -> np.ndarray:
+    """ Return the squared length of each vector, array of shape (..., 2)"""
+    return dot_products(u, u)
+
+
+def normal_vectors(e: np.ndarray) -> np.ndarray:
+    """ Return a unit normal vector of each segment direction, array of shape (n, 2)"""
+    normals = np.stack([-e[:, 1], e[:, 0]], axis=1)
+    normals /= np.sqrt(squared_lengths(normals))[:, np.newaxis]
+    return normals
+
+
+def reflect(d: np.ndarray, normals: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    Return the vectors reflected on lines with the given unit normal vectors, arrays of shape (n, 2)
+    :param out: array where the result is written, may be d itself
+    """
+    f = 2 * dot_products(d, normals)
+    return np.subtract(d, f[:, np.newaxis] * normals, out=out)
+
+
+def ray_segment_intersections(o: np.ndarray, d: np.ndarray, p0: np.ndarray, e: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the parameters (t, s) of the intersections of rays o + t * d with the lines of segments p0 + s * e. Inputs
+    broadcast against each other, e.g. rays of shape (k, 1, 2) against segments of shape (1, n, 2). Parameters of
+    parallel pairs are nan or inf.
+    """
+    w = p0 - o
+    denominator = cross_products(d, e)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = cross_products(w, e) / denominator
+        s = cross_products(w, d) / denominator
+    return t, s
+
+
+def closest_ray_segment_hits(o: np.ndarray, d: np.ndarray, p0: np.ndarray, e: np.ndarray, segments: np.ndarray,
+                             ignored: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return for each ray the parameter t of its closest hit among candidate segments, and the index of this segment.
+    t is inf and the index -1 if no candidate is hit. Hits at t <= epsilon, i.e. at the origin of the ray, are ignored.
+    :param o: origins of the rays, array of shape (k, 2)
+    :param d: directions of the rays, array of shape (k, 2)
+    :param p0: first points of the candidate segments, array of shape (k, n, 2) or (1, n, 2)
+    :param e: directions of the candidate segments, array of shape (k, n, 2) or (1, n, 2)
+    :param segments: indices of the candidate segments, -1 for padding, array of shape (k, n) or (1, n)
+    :param ignored: index of a segment ignored by each ray, -1 if none, array of shape (k,)
+    """
+    t, s = ray_segment_intersections(o[:, np.newaxis, :], d[:, np.newaxis, :], p0, e)
+
+    is_hit = (segments >= 0) & (segments != ignored[:, np.newaxis])
+    is_hit &= (t > epsilon) & (s >= -epsilon) & (s <= 1 + epsilon)
+    t = np.where(is_hit, t, np.inf)
+
+    closest = t.argmin(axis=1)
+    rows = np.arange(len(o))
+    t_closest = t[rows, closest]
+    index = np.broadcast_to(segments, t.shape)[rows, closest]
+    return t_closest, np.where(np.isfinite(t_closest), index, -1)
@@ -0,0 +1,139 @@
+from typing import Tuple
+
+import numpy as np
+
+from src.mathematics import closest_ray_segment_hits, epsilon
+
+
+class SegmentBVH:
+    """
+    Bounding volume hierarchy over 2d segments, used to find the first segment hit by rays. Each node holds the
+    bounding box of its segments, internal nodes are split at the median of the segment centers along their longest
+    side.
+
+    Queries walk the tree for all rays together: every ray keeps its own stack of nodes, and each iteration pops one
+    node per ray. Children are visited nearest first and nodes entered beyond the closest hit found are skipped, so a
+    ray only visits a number of nodes roughly logarithmic in the number of segments.
+    """
+
+    leaf_size = 8
+
+    def __init__(self, segments: np.ndarray):
+        """
+        :param segments: segments, array of shape (n, 4) where each row is x0, y0, x1, y1
+        """
+        self.segments = np.asarray(segments, dtype=float).reshape(-1, 4)
+        self.p0 = self.segments[:, :2]
+        self.e = self.segments[:, 2:] - self.p0
+
+        lower = np.minimum(self.p0, self.segments[:, 2:])
+        upper = np.maximum(self.p0, self.segments[:, 2:])
+
+        boxes, children, leaves = [], [], []
+        self.depth = 0
+
+        stack = [(np.arange(len(self.segments)), 0, -1, 0)]  # segments, depth, parent node, side in parent
+        while stack:
+            indices, depth, parent, side = stack.pop()
+            node = len(boxes)
+            if parent >= 0:
+                children[parent][side] = node
+            self.depth = max(self.depth, depth)
+
+            boxes.append(np.concatenate([lower[indices].min(axis=0), upper[indices].max(axis=0)]))
+            children.append([-1, -1])
+
+            if len(indices) <= SegmentBVH.leaf_size:
+                leaves.append(np.pad(indices, (0, SegmentBVH.leaf_size - len(indices)), constant_values=-1))
+                continue
+
+            leaves.append(np.full(SegmentBVH.leaf_size, -1))
+            centers = (lower[indices] + upper[indices]) / 2
+            axis = int(np.argmax(centers.max(axis=0) - centers.min(axis=0)))
+            half = len(indices) // 2
+            split = np.argpartition(centers[:, axis], half)
+            stack.append((indices[split[half:]], depth + 1, node, 1))
+            stack.append((indices[split[:half]], depth + 1, node, 0))
+
+        self.boxes = np.array(boxes, dtype=float).reshape(-1, 4)
+        self.boxes[:, :2] -= epsilon
+        self.boxes[:, 2:] += epsilon
+        self.children = np.array(children, dtype=np.int64).reshape(-1, 2)
+        self.leaves = np.array(leaves, dtype=np.int64).reshape(-1, SegmentBVH.leaf_size)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def closest_hit(self, o: np.ndarray, d: np.ndarray, ignored: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return for each ray the distance to the closest segment it hits and the index of this segment, inf and -1 if
+        none
+        :param o: origins of the rays, array of shape (k, 2)
+        :param d: unit directions of the rays, array of shape (k, 2)
+        :param ignored: index of a segment ignored by each ray, -1 if none, array of shape (k,)
+        """
+        k = len(o)
+        best_t = np.full(k, np.inf)
+        best_segment = np.full(k, -1)
+        if not len(self.segments):
+            return best_t, best_segment
+
+        with np.errstate(divide="ignore"):
+            inverse_d = 1. / d
+
+        # stacks of nodes to visit with the distance to their entry, the root is pushed on every stack
+        stack = np.zeros((k, self.depth + 2), dtype=np.int64)
+        stack_t = np.zeros((k, self.depth + 2))
+        stack_t[:, 0] = self._box_entry(o, inverse_d, self.boxes[np.zeros(k, dtype=np.int64)])
+        stack_size = np.ones(k, dtype=np.int64)
+
+        rays = np.arange(k)
+        while len(rays):
+            stack_size[rays] -= 1
+            nodes = stack[rays, stack_size[rays]]
+
+            is_visited = stack_t[rays, stack_size[rays]] < best_t[rays]
+            rays, nodes = rays[is_visited], nodes[is_visited]
+
+            is_leaf = self.children[nodes, 0] < 0
+            self._hit_leaves(o, d, ignored, rays[is_leaf], nodes[is_leaf], best_t, best_segment)
+            self._push_children(o, inverse_d, rays[~is_leaf], nodes[~is_leaf], best_t, stack, stack_t, stack_size)
+
+            rays = np.flatnonzero(stack_size > 0)
+
+        return best_t, best_segment
+
+    @staticmethod
+    def _box_entry(o: np.ndarray, inverse_d: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """ Return the distance along each ray to the entry in its box, inf if the ray misses the box """
+        with np.errstate(invalid="ignore"):
+            t0 = (boxes[:, :2] - o) * inverse_d
+            t1 = (boxes[:, 2:] - o) * inverse_d
+        t_near = np.fmax(np.fmin(t0, t1).max(axis=1), 0.)
+        t_far = np.fmax(t0, t1).min(axis=1)
+        return np.where(t_near <= t_far, t_near, np.inf)
+
+    def _hit_leaves(self, o, d, ignored, rays, nodes, best_t, best_segment) -> None:
+        segments = self.leaves[nodes]  # shape (n, leaf_size), padded with -1
+        t, segment = closest_ray_segment_hits(o[rays], d[rays], self.p0[segments], self.e[segments], segments,
+                                              ignored[rays])
+
+        is_better = t < best_t[rays]
+        best_t[rays[is_better]] = t[is_better]
+        best_segment[rays[is_better]] = segment[is_better]
+
+    def _push_children(self, o, inverse_d, rays, nodes, best_t, stack, stack_t, stack_size) -> None:
+        """ Push the children whose box is hit before the closest hit found, the nearest being on top """
+        children = self.children[nodes]
+        t = np.stack([self._box_entry(o[rays], inverse_d[rays], self.boxes[children[:, side]]) for side in (0, 1)],
+                     axis=1)
+        is_swapped = t[:, 0] < t[:, 1]
+        children[is_swapped] = children[is_swapped, ::-1]
+        t[is_swapped] = t[is_swapped, ::-1]
+
+        for side in (0, 1):
+            is_pushed = t[:, side] < best_t[rays]
+            pushed_rays = rays[is_pushed]
+            stack[pushed_rays, stack_size[pushed_rays]] = children[is_pushed, side]
+            stack_t[pushed_rays, stack_size[pushed_rays]] = t[is_pushed, side]
+            stack_size[pushed_rays] += 1
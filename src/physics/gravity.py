@@ -0,0 +1,240 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from src.mathematics import Vector, squared_lengths
+from src.physics.mechanics import Force, Particle
+
+
+def _spread_bits(x: np.ndarray) -> np.ndarray:
+    """ Insert a zero bit between each of the 16 lower bits of x """
+    x = x & 0x0000FFFF
+    x = (x | (x << 8)) & 0x00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F
+    x = (x | (x << 2)) & 0x33333333
+    x = (x | (x << 1)) & 0x55555555
+    return x
+
+
+class QuadTreeLevel:
+    """
+    Class holding the non empty cells of one level of a quadtree, sorted by Morton key
+    """
+
+    def __init__(self, keys: np.ndarray, starts: np.ndarray, counts: np.ndarray, mass: np.ndarray, com: np.ndarray):
+        """
+        :param keys: Morton key of each cell
+        :param starts: index of the first point of each cell in the sorted points
+        :param counts: number of points in each cell
+        :param mass: total mass of each cell
+        :param com: center of mass of each cell, array of shape (n_cells, 2)
+        """
+        self.keys = keys
+        self.starts = starts
+        self.counts = counts
+        self.mass = mass
+        self.com = com
+
+        # range of the children of each cell in the next level
+        self.child_start = None
+        self.child_end = None
+
+
+class QuadTree:
+    """
+    Linear quadtree over a square region. Points are sorted along a Morton curve so that every cell of every level is
+    a contiguous range of points, which lets the tree be built and traversed with array operations only.
+    """
+
+    max_depth = 16
+    block_size = 8192  # number of points whose forces are computed together, bounds the memory of the traversal
+
+    def __init__(self, origin: Tuple[float, float], size: float, r: np.ndarray, m: np.ndarray):
+        """
+        :param origin: lower left corner of the square region
+        :param size: side length of the square region
+        :param r: positions of the points, array of shape (n, 2)
+        :param m: masses of the points, array of shape (n,)
+        """
+        self.origin = np.asarray(origin, dtype=float)
+        self.size = float(size)
+
+        codes = self._morton_codes(r)
+        self.order = np.argsort(codes, kind="stable")
+        self.codes = codes[self.order]
+        self.r = r[self.order]
+        self.m = m[self.order]
+
+        self.levels = []
+        self._build()
+
+    def forces(self, g: float, theta: float, softening: float) -> np.ndarray:
+        """
+        Return the gravitational force exerted on each point of the tree by all the other points
+        :param g: gravitational constant
+        :param theta: opening angle, cells seen under an angle smaller than theta are approximated by their center
+        of mass. 0 gives the exact pairwise sum.
+        :param softening: softening length, avoids singular forces for close encounters
+        :return: forces, array of shape (n, 2), in the order of the points given at construction
+        """
+        f_sorted = np.zeros_like(self.r)
+        for i0 in range(0, len(self.m), QuadTree.block_size):
+            points = np.arange(i0, min(i0 + QuadTree.block_size, len(self.m)))
+            f_sorted[points] = self._field(self.r[points], self.codes[points], self.m[points], g, theta, softening)
+            f_sorted[points] *= self.m[points, np.newaxis]
+
+        f = np.empty_like(f_sorted)
+        f[self.order] = f_sorted
+        return f
+
+    def field(self, r: np.ndarray, g: float, theta: float, softening: float) -> np.ndarray:
+        """
+        Return the gravitational field created by the points of the tree at the given positions
+        :param r: positions where the field is evaluated, array of shape (k, 2)
+        :param g: gravitational constant
+        :param theta: opening angle
+        :param softening: softening length
+        :return: field, array of shape (k, 2)
+        """
+        return self._field(r, self._morton_codes(r), None, g, theta, softening)
+
+    def _morton_codes(self, r: np.ndarray) -> np.ndarray:
+        n_cells = 2 ** QuadTree.max_depth
+        cells = np.floor((r - self.origin) / self.size * n_cells).astype(np.int64)
+        cells = np.clip(cells, 0, n_cells - 1)
+        return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1)
+
+    def _build(self) -> None:
+        n = len(self.m)
+        weighted_r = self.r * self.m[:, np.newaxis]
+
+        for level in range(QuadTree.max_depth + 1):
+            keys = self.codes >> (2 * (QuadTree.max_depth - level))
+            is_start = np.ones(n, dtype=bool)
+            is_start[1:] = keys[1:] != keys[:-1]
+            starts = np.flatnonzero(is_start)
+            counts = np.diff(np.append(starts, n))
+            mass = np.add.reduceat(self.m, starts)
+            com = np.add.reduceat(weighted_r, starts) / mass[:, np.newaxis]
+            self.levels.append(QuadTreeLevel(keys[starts], starts, counts, mass, com))
+
+            if (counts == 1).all():
+                break
+
+        for parent, child in zip(self.levels[:-1], self.levels[1:]):
+            parent_keys = child.keys >> 2
+            parent.child_start = np.searchsorted(parent_keys, parent.keys, side="left")
+            parent.child_end = np.searchsorted(parent_keys, parent.keys, side="right")
+
+    def _field(self, r: np.ndarray, codes: np.ndarray, m: Optional[np.ndarray], g: float, theta: float,
+               softening: float) -> np.ndarray:
+        """
+        Walk the tree level by level for all the query points at once. The walk keeps a frontier of (point, cell)
+        pairs: far enough cells and leaves contribute to the field, the others are replaced by their children.
+        When m is given, the query points are the points of the tree and their own mass is excluded.
+        """
+        field = np.zeros((len(r), 2))
+        if not len(self.m):
+            return field
+
+        eps2 = softening ** 2
+        theta2 = theta ** 2
+        last_level = len(self.levels) - 1
+
+        points = np.arange(len(r))
+        cells = np.zeros(len(r), dtype=np.int64)
+
+        for level_index, level in enumerate(self.levels):
+            cell_size = self.size / (2 ** level_index)
+            shift = 2 * (QuadTree.max_depth - level_index)
+
+            d = level.com[cells] - r[points]
+            dist2 = squared_lengths(d)
+            contains = (codes[points] >> shift) == level.keys[cells]
+            is_leaf = (level.counts[cells] == 1) | (level_index == last_level)
+            is_accepted = is_leaf | ((cell_size ** 2 < theta2 * dist2) & ~contains)
+
+            mass = level.mass[cells]
+            if m is not None:
+                is_self = is_accepted & contains
+                m_self = m[points[is_self]]
+                remaining = mass[is_self] - m_self
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    com = (level.com[cells[is_self]] * mass[is_self, np.newaxis]
+                           - r[points[is_self]] * m_self[:, np.newaxis]) / remaining[:, np.newaxis]
+                com[remaining <= 0] = r[points[is_self]][remaining <= 0]
+                d[is_self] = com - r[points[is_self]]
+                dist2[is_self] = squared_lengths(d[is_self])
+                mass[is_self] = np.maximum(remaining, 0.)
+
+            is_contributing = is_accepted & (mass > 0)
+            k = g * mass[is_contributing] / (dist2[is_contributing] + eps2) ** 1.5
+            contributing_points = points[is_contributing]
+            field[:, 0] += np.bincount(contributing_points, weights=k * d[is_contributing, 0], minlength=len(r))
+            field[:, 1] += np.bincount(contributing_points, weights=k * d[is_contributing, 1], minlength=len(r))
+
+            opened = ~is_accepted
+            if not opened.any():
+                break
+            points, cells = self._open(level, points[opened], cells[opened])
+
+        return field
+
+    @staticmethod
+    def _open(level: QuadTreeLevel, points: np.ndarray, cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Replace each (point, cell) pair by the pairs of the point with every child of the cell """
+        starts = level.child_start[cells]
+        n_children = level.child_end[cells] - starts
+        total = int(n_children.sum())
+
+        group_offsets = np.repeat(np.cumsum(n_children) - n_children, n_children)
+        children = np.repeat(starts, n_children) + np.arange(total) - group_offsets
+        return np.repeat(points, n_children), children
+
+
+class MutualGravity(Force):
+    """
+    Class representing the gravitational attraction between every pair of particles. Forces are approximated with a
+    Barnes-Hut quadtree built over the world rectangle, which costs O(n log n) instead of O(n^2).
+    """
+
+    cache_attributes = ("tree",)
+
+    def __init__(self, dim: Tuple[int, int], g: float = 1., theta: float = 0.5, softening: float = 1.):
+        """
+        :param dim: dimension of the world, the tree covers this rectangle and grows to contain outside particles
+        :param g: gravitational constant
+        :param theta: opening angle of the Barnes-Hut approximation, 0 gives the exact pairwise sum
+        :param softening: softening length, avoids singular forces for close encounters
+        """
+        self.dim = dim
+        self.g = g
+        self.theta = theta
+        self.softening = softening
+
+        self.tree = None  # tree built during the last batched evaluation
+
+    def __getstate__(self) -> dict:
+        """ The tree is only a cache of the last evaluation, it is not saved """
+        state = self.__dict__.copy()
+        state["tree"] = None
+        return state
+
+    def apply_on(self, p: Particle) -> Vector:
+        """Apply on a given particle the force exerted by the particles of the last batched evaluation"""
+        if self.tree is None:
+            return Vector()
+        fx, fy = self.tree.field(np.array([[p.r.x, p.r.y]]), self.g, self.theta, self.softening)[0] * p.m
+        return Vector(float(fx), float(fy))
+
+    def apply_on_batch(self, r: np.ndarray, v: np.ndarray, m: np.ndarray) -> np.ndarray:
+        """Apply the force on many particles at once"""
+        if not len(m):
+            return np.zeros((0, 2))
+
+        lower = np.minimum(r.min(axis=0), 0.)
+        upper = np.maximum(r.max(axis=0), self.dim)
+        size = float((upper - lower).max()) * (1. + 1e-9)
+
+        self.tree = QuadTree(lower, size, r, m)
+        return self.tree.forces(self.g, self.theta, self.softening)
@@ -0,0 +1,87 @@
+import abc
+from typing import Callable
+
+import numpy as np
+
+Acceleration = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+class Integrator(abc.ABC):
+    """
+    Abstract class representing a numerical scheme advancing the particles of a store over a time step
+    """
+
+    @abc.abstractmethod
+    def step(self, store, dt: float, acceleration: Acceleration) -> None:
+        """
+        Advance positions and velocities of the store in place
+        :param store: particle store to be advanced
+        :param dt: time step in seconds
+        :param acceleration: function returning the accelerations, array of shape (n, 2), for given positions and
+        velocities
+        """
+        pass
+
+
+class ExplicitEuler(Integrator):
+    """
+    Explicit Euler scheme, first order. Positions are advanced with the velocities at the beginning of the step.
+    """
+
+    def step(self, store, dt: float, acceleration: Acceleration) -> None:
+        store.a[:] = acceleration(store.r, store.v)
+        store.r[:] += store.v * dt
+        store.v[:] += store.a * dt
+        store.is_acceleration_current = False
+
+
+class SemiImplicitEuler(Integrator):
+    """
+    Semi implicit (symplectic) Euler scheme, first order. Positions are advanced with the updated velocities, which
+    keeps the energy of orbits bounded.
+    """
+
+    def step(self, store, dt: float, acceleration: Acceleration) -> None:
+        store.a[:] = acceleration(store.r, store.v)
+        store.v[:] += store.a * dt
+        store.r[:] += store.v * dt
+        store.is_acceleration_current = False
+
+
+class VelocityVerlet(Integrator):
+    """
+    Velocity Verlet scheme, i.e. kick-drift-kick leapfrog, second order and symplectic. The accelerations computed at
+    the end of a step are reused at the beginning of the next one, so it costs a single force evaluation per step.
+    """
+
+    def step(self, store, dt: float, acceleration: Acceleration) -> None:
+        if not store.is_acceleration_current:
+            store.a[:] = acceleration(store.r, store.v)
+
+        store.v[:] += store.a * (dt / 2)
+        store.r[:] += store.v * dt
+        store.a[:] = acceleration(store.r, store.v)
+        store.v[:] += store.a * (dt / 2)
+        store.is_acceleration_current = True
+
+
+class RungeKutta4(Integrator):
+    """
+    Classical Runge-Kutta scheme, fourth order. It costs four force evaluations per step.
+    """
+
+    def step(self, store, dt: float, acceleration: Acceleration) -> None:
+        r, v = store.r.copy(), store.v.copy()
+
+        k1_r, k1_v = v, acceleration(r, v)
+        k2_r = v + k1_v * (dt / 2)
+        k2_v = acceleration(r + k1_r * (dt / 2), k2_r)
+        k3_r = v + k2_v * (dt / 2)
+        k3_v = acceleration(r + k2_r * (dt / 2), k3_r)
+        k4_r = v + k3_v * dt
+        k4_v = acceleration(r + k3_r * dt, k4_r)
+
+        store.r[:] += (k1_r + 2 * k2_r + 2 * k3_r + k4_r) * (dt / 6)
+        store.v[:] += (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6)
+        store.a[:] = (k1_v + 2 * k2_v + 2 * k3_v + k4_v) / 6
+        store.is_acceleration_current = False
@@ -1,27 +1,127 @@
 import abc
-import uuid
 
-from src.mathematics import Vector
+import numpy as np
+
+from src.mathematics import Vector, squared_lengths
 
 
 class Particle:
     """
-    Class which represents a particle, i.e. a punctual mass. It is uniquely identified with an uuid.
+    Class which represents a particle, i.e. a punctual mass. It is uniquely identified with an integer id, never
+    reused.
+
+    Once added to a world, the particle becomes a view onto a row of the world's particle store: reading r, v or a
+    returns a copy of the stored values and assigning them writes back to the store.
     """
 
+    _next_id = 0
+
     def __init__(self, r: Vector, v: Vector, m: float):
         """
         :param r: position in world reference frame
         :param v: velocity in world reference frame
         :param m: mass
         """
-        self.id = uuid.uuid1()
-        self.t = 0  # living duration in seconds
-        self.m = m
+        self.id = Particle.reserve_ids(1)
+        self._init_state(r, v, m)
 
-        self.r = r
-        self.v = v
-        self.a = Vector()
+    @classmethod
+    def detached(cls, r: Vector, v: Vector, m: float) -> "Particle":
+        """
+        Return a particle without id, -1, which is not counted among the particles, e.g. to evaluate a force at a
+        given state
+        """
+        p = cls.__new__(cls)
+        p.id = -1
+        p._init_state(r, v, m)
+        return p
+
+    def _init_state(self, r: Vector, v: Vector, m: float) -> None:
+        self._store = None  # store the particle is a view of, None while not added to a world
+        self._index = -1  # row of the particle in the store
+
+        self._t = 0  # living duration in seconds
+        self._m = m
+        self._r = r
+        self._v = v
+        self._a = Vector()
+
+    @staticmethod
+    def reserve_ids(n: int) -> int:
+        """ Reserve n consecutive particle ids and return the first one """
+        first = Particle._next_id
+        Particle._next_id += n
+        return first
+
+    @property
+    def handle(self) -> int:
+        """ Handle of the particle in the store it is a view of, -1 while not added to a world """
+        return int(self._store.handles[self._index]) if self._store is not None else -1
+
+    def bind(self, store, index: int) -> None:
+        """
+        Make the particle a view onto the given row of a store
+        :param store: store holding the particle state
+        :param index: row of the particle in the store
+        """
+        self._store = store
+        self._index = index
+
+    def unbind(self) -> None:
+        """ Copy the state back from the store and detach the particle from it """
+        self._t, self._m = self.t, self.m
+        self._r, self._v, self._a = self.r, self.v, self.a
+        self._store = None
+        self._index = -1
+
+    @property
+    def t(self) -> float:
+        return float(self._store.t[self._index]) if self._store is not None else self._t
+
+    @t.setter
+    def t(self, t: float) -> None:
+        if self._store is not None:
+            self._store.t[self._index] = t
+            self._store.version += 1
+        else:
+            self._t = t
+
+    @property
+    def m(self) -> float:
+        return float(self._store.m[self._index]) if self._store is not None else self._m
+
+    @m.setter
+    def m(self, m: float) -> None:
+        if self._store is not None:
+            self._store.m[self._index] = m
+            self._store.version += 1
+            self._store.is_acceleration_current = False
+        else:
+            self._m = m
+
+    @property
+    def r(self) -> Vector:
+        return self._get_vector("r")
+
+    @r.setter
+    def r(self, r: Vector) -> None:
+        self._set_vector("r", r)
+
+    @property
+    def v(self) -> Vector:
+        return self._get_vector("v")
+
+    @v.setter
+    def v(self, v: Vector) -> None:
+        self._set_vector("v", v)
+
+    @property
+    def a(self) -> Vector:
+        return self._get_vector("a")
+
+    @a.setter
+    def a(self, a: Vector) -> None:
+        self._set_vector("a", a)
 
     def update(self, dt: float, f: Vector) -> None:
         """
@@ -36,14 +136,59 @@ class Particle:
         self.v += self.a * dt
         self.r += self.v * dt
 
+    def _get_vector(self, name: str) -> Vector:
+        if self._store is None:
+            return getattr(self, "_" + name)
+        x, y = getattr(self._store, name)[self._index]
+        return Vector(float(x), float(y))
+
+    def _set_vector(self, name: str, vector: Vector) -> None:
+        if self._store is None:
+            setattr(self, "_" + name, vector)
+            return
+        getattr(self._store, name)[self._index] = vector.x, vector.y
+        self._store.version += 1
+        if name != "a":
+            self._store.is_acceleration_current = False
+
 
 class Force(abc.ABC):
-    """ Abstract class representing a force"""
+    """
+    Abstract class representing a force. Assigning an attribute of a force increments its version, so that a world
+    knows the accelerations computed with the force are out of date. Attributes listed in cache_attributes, which do
+    not change the force, are left out.
+    """
+
+    cache_attributes = ()
+    version = 0
+
+    def __setattr__(self, name, value) -> None:
+        super().__setattr__(name, value)
+        if name != "version" and name not in self.cache_attributes:
+            super().__setattr__("version", self.version + 1)
 
     @abc.abstractmethod
     def apply_on(self, p: Particle) -> Vector:
         pass
 
+    def apply_on_batch(self, r: np.ndarray, v: np.ndarray, m: np.ndarray) -> np.ndarray:
+        """
+        Apply the force on many particles at once. This default implementation falls back on apply_on for each row,
+        given as a detached particle with the position, velocity and mass of the row but no id (-1) and a living
+        duration of 0, since rows may be intermediate states of an integrator. Subclasses should override it with a
+        vectorized version.
+        :param r: positions, array of shape (n, 2)
+        :param v: velocities, array of shape (n, 2)
+        :param m: masses, array of shape (n,)
+        :return: forces, array of shape (n, 2)
+        """
+        f = np.zeros((len(m), 2))
+        for i in range(len(m)):
+            p = Particle.detached(Vector(*r[i]), Vector(*v[i]), float(m[i]))
+            fi = self.apply_on(p)
+            f[i] = fi.x, fi.y
+        return f
+
 
 class CentralForce(Force):
     """
@@ -60,6 +205,12 @@ class CentralForce(Force):
         f = f.scale_to(self.magn / self.center.distance_to(p.r))
         return f
 
+    def apply_on_batch(self, r: np.ndarray, v: np.ndarray, m: np.ndarray) -> np.ndarray:
+        """Apply the force on many particles at once"""
+        d = np.array([self.center.x, self.center.y]) - r
+        d2 = squared_lengths(d)
+        return d * (self.magn / d2)[:, np.newaxis]
+
 
 class ConstantForce(Force):
     """
@@ -73,3 +224,9 @@ class ConstantForce(Force):
         """Apply the force on a given particle"""
 
         return self.f
+
+    def apply_on_batch(self, r: np.ndarray, v: np.ndarray, m: np.ndarray) -> np.ndarray:
+        """Apply the force on many particles at once"""
+        f = np.empty((len(m), 2))
+        f[:] = self.f.x, self.f.y
+        return f
@@ -1,8 +1,16 @@
+from __future__ import annotations
+
+import itertools
 import math
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
 
-from src.mathematics import DirectedSegment, Segment, Vector
+from src.mathematics import DirectedSegment, Segment, closest_ray_segment_hits, epsilon, normal_vectors, reflect
+from src.physics.bvh import SegmentBVH
 from src.physics.mechanics import Particle
+from src.physics.radiance import RadianceGrid
 
 Coefs = Tuple[float, float, float]
 
@@ -22,6 +30,69 @@ class Ray:
         return [DirectedSegment(self.points[i], self.points[i + 1]) for i in range(len(self.points) - 1)]
 
 
+class RayBundle:
+    """
+    Class holding many rays packed in two arrays: the points of all the rays one after the other, and the offsets
+    where the points of each ray start, the points of ray i being points[offsets[i]:offsets[i + 1]]. Rays are only
+    built as Ray objects when indexed one by one.
+    """
+
+    def __init__(self, points: np.ndarray = None, offsets: np.ndarray = None):
+        """
+        :param points: points of the rays, array of shape (n_points, 2)
+        :param offsets: index of the first point of each ray, followed by n_points, array of shape (n_rays + 1,)
+        """
+        self.points = np.zeros((0, 2)) if points is None else points
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            i0, i1, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("Rays can only be sliced with a step of 1")
+            i1 = max(i0, i1)
+            return RayBundle(self.points[self.offsets[i0]:self.offsets[i1]], self.offsets[i0:i1 + 1] - self.offsets[i0])
+
+        i = int(item) + len(self) if item < 0 else int(item)
+        if not 0 <= i < len(self):
+            raise IndexError("Ray {} out of range".format(item))
+
+        points = [tuple(p) for p in self.points[self.offsets[i]:self.offsets[i + 1]].tolist()]
+        ray = Ray(points[0])
+        ray.points = points
+        return ray
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def n_segments(self) -> int:
+        return len(self.points) - len(self)
+
+    def segments(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Return the first and second points of all the segments of the rays, arrays of shape (n_segments, 2) """
+        is_segment = np.ones(max(len(self.points) - 1, 0), dtype=bool)
+        is_segment[self.offsets[1:-1] - 1] = False
+        return self.points[:-1][is_segment], self.points[1:][is_segment]
+
+    def copy(self) -> RayBundle:
+        return RayBundle(self.points.copy(), self.offsets.copy())
+
+    @staticmethod
+    def concatenate(bundles: List[RayBundle]) -> RayBundle:
+        """ Return the rays of all the bundles, in order """
+        if not bundles:
+            return RayBundle()
+
+        shifts = np.cumsum([0] + [len(b.points) for b in bundles[:-1]])
+        offsets = [b.offsets[:-1] + shift for b, shift in zip(bundles, shifts)]
+        offsets.append([shifts[-1] + len(bundles[-1].points)])
+        return RayBundle(np.concatenate([b.points for b in bundles]), np.concatenate(offsets).astype(np.int64))
+
+
 class PlaneMirror:
     """
     Class representing a plane mirror
@@ -30,111 +101,323 @@ class PlaneMirror:
     def __init__(self, segment: Segment):
         self.segment = segment
 
-    def reflect(self, ray_segment) -> Optional[Tuple[float, float, float]]:
+    def reflect(self, ray_segment: DirectedSegment) -> Optional[Tuple[float, float, float]]:
         """ Return a vector representing the direction of the reflected ray. If no reflection, return None."""
-
-        incident_vector = ray_segment.colinear_vector().invert()
         p = ray_segment.intersection_point(self.segment)
         if not p:
             return None
 
         r0 = ray_segment.first
-        ray_segment.intersection_point(self.segment)
-        if abs(r0[0] - p[0]) < 0.000001 and abs(r0[1] - p[1]) < 0.000001:
+        if abs(r0[0] - p[0]) < epsilon and abs(r0[1] - p[1]) < epsilon:
             return None
 
-        reflection_angle = 2 * self._get_incidence_angle(incident_vector)
-        reflection_vector = self._get_reflection_vector(reflection_angle, incident_vector)
+        reflection_vector = ray_segment.colinear_vector().reflect(self.segment.get_normal_vector())
+        return p[0], p[1], math.atan2(reflection_vector.y, reflection_vector.x)
+
+
+class MirrorList(list):
+    """
+    List of mirrors with a version number changed by every modification, so that what is derived from the mirrors
+    is only rebuilt when they change. Versions are unique among all lists. Mirrors modified in place are not detected,
+    they must be replaced in the list instead.
+    """
+
+    _versions = itertools.count()
+
+    def __init__(self, mirrors=()):
+        super().__init__(mirrors)
+        self.version = next(MirrorList._versions)
+
+    def append(self, mirror: PlaneMirror) -> None:
+        self.version = next(MirrorList._versions)
+        super().append(mirror)
 
-        return p[0], p[1], - reflection_vector.angle_to_x()
+    def extend(self, mirrors) -> None:
+        self.version = next(MirrorList._versions)
+        super().extend(mirrors)
 
-    def _get_incidence_angle(self, incident_vector: Vector) -> float:
-        normal_vec_angle = incident_vector.angle(self.segment.get_normal_vector())
-        inverted_normal_vec_angle = incident_vector.angle(self.segment.get_normal_vector().invert())
-        return normal_vec_angle if abs(normal_vec_angle) < abs(inverted_normal_vec_angle) else inverted_normal_vec_angle
+    def insert(self, index: int, mirror: PlaneMirror) -> None:
+        self.version = next(MirrorList._versions)
+        super().insert(index, mirror)
 
-    def _get_reflection_vector(self, reflection_angle: float, incident_vector: Vector) -> Vector:
-        cs = math.cos(reflection_angle)
-        sn = math.sin(reflection_angle)
-        x, y = incident_vector.x, incident_vector.y
-        new_x = (x * cs) - (y * sn)
-        new_y = (x * sn) + (y * cs)
-        return Vector(new_x, new_y)
+    def remove(self, mirror: PlaneMirror) -> None:
+        self.version = next(MirrorList._versions)
+        super().remove(mirror)
+
+    def pop(self, index: int = -1) -> PlaneMirror:
+        self.version = next(MirrorList._versions)
+        return super().pop(index)
+
+    def clear(self) -> None:
+        self.version = next(MirrorList._versions)
+        super().clear()
+
+    def __setitem__(self, index, mirror) -> None:
+        self.version = next(MirrorList._versions)
+        super().__setitem__(index, mirror)
+
+    def __delitem__(self, index) -> None:
+        self.version = next(MirrorList._versions)
+        super().__delitem__(index)
+
+    def __iadd__(self, mirrors):
+        self.version = next(MirrorList._versions)
+        return super().__iadd__(mirrors)
+
+
+def get_mirrors_key(mirrors: List[PlaneMirror]):
+    """ Return a value which changes whenever the mirrors change """
+    if isinstance(mirrors, MirrorList):
+        return mirrors.version
+    return tuple(id(m) for m in mirrors)
 
 
 class RayEmitter:
     """
-    Class that generate rays from punctual entities
+    Class that generate rays from punctual entities. Rays are traced all together: at each bounce, every ray still
+    travelling looks for its closest mirror at once with array operations. With many mirrors, the search goes through
+    a bounding volume hierarchy over the mirrors, rebuilt only when the mirrors change.
     """
 
-    def __init__(self, width, height):
-        self.n_rays = 16
+    max_n_segments = 100  # rays are stopped after this number of segments, e.g. when trapped between mirrors
+    max_n_pairs = 2 ** 20  # maximum number of (ray, mirror) pairs intersected at once, bounds the memory used
+    min_n_mirrors_for_bvh = 256  # below, no hierarchy is built
+    min_n_pairs_for_bvh = 2 ** 16  # below, testing every (ray, mirror) pair is faster than walking the hierarchy
+
+    max_n_rays_per_batch = 2 ** 16  # maximum number of rays traced at once when accumulating radiance
+
+    def __init__(self, width, height, n_rays: int = 16):
+        """
+        :param width: width of the world
+        :param height: height of the world
+        :param n_rays: number of rays emitted by each emitter, evenly spread around it
+        """
+        self.n_rays = n_rays
         self.width, self.height = width, height
 
-    def emit(self, particle: Particle, mirrors: [PlaneMirror]) -> [Ray]:
+        self._mirrors_key = None  # identifies the mirrors the segments and hierarchy were built from
+        self._segments = np.zeros((0, 4))
+        self._bvh = None
+
+    def emit(self, particle: Particle, mirrors: [PlaneMirror]) -> RayBundle:
         """ Emit rays from a particle """
-        angles = [math.pi * 2 * i / self.n_rays for i in range(self.n_rays)]
-        rays = [self._generate_ray(angle, particle, mirrors) for angle in angles]
-        return [ray for ray in rays if ray]
-
-    def _generate_ray(self, angle: float, particle: Particle, mirrors: List[PlaneMirror]) -> Optional[Ray]:
-        ray = Ray((particle.r.x, particle.r.y))
-
-        while True:
-            ray_segment = self._get_ray_segment(angle, ray)
-            intersections = [self._intersect_with_world(ray_segment)]
-            intersections.extend(self._intersect_with_mirrors(ray_segment, mirrors))
-
-            x, y, angle = self._closest_intersection(ray.points[-1], intersections)
-            ray.add((x, y))
-            if angle is None or len(ray.points) > 100:
-                if len(ray.points) > 100:
-                    print(ray)
-                return ray
-
-    def _intersect_with_world(self, ray_segment: Segment) -> Tuple[float, float, float]:
-
-        world_right = Segment((self.width, 0), (self.width, self.height))
-        world_bottom = Segment((0, 0), (self.width, 0))
-        world_top = Segment((0, self.height), (self.width, self.height))
-        world_left = Segment((0, 0), (0, self.height))
-
-        p = ray_segment.intersection_point(world_right)
-        if p: return p[0], p[1], None
-        p = ray_segment.intersection_point(world_top)
-        if p: return p[0], p[1], None
-        p = ray_segment.intersection_point(world_bottom)
-        if p: return p[0], p[1], None
-        p = ray_segment.intersection_point(world_left)
-        if p: return p[0], p[1], None
-
-        raise Exception()
-
-    def _closest_intersection(self, point, intersections):
-        x, y = point
-        min_dist = float("inf")
-        index = -1
-
-        for i in range(len(intersections)):
-            ix, iy, _ = intersections[i]
-            d = math.sqrt((x - ix) ** 2 + (y - iy) ** 2)
-            if d < min_dist:
-                min_dist = d
-                index = i
-
-        return intersections[index]
-
-    def _intersect_with_mirrors(self, ray_segment: DirectedSegment, mirrors: List[PlaneMirror]):
-        intersections = []
-        for mirror in mirrors:
-            r = mirror.reflect(ray_segment)
-            if r:
-                intersections.append(r)
-        return intersections
-
-    def _get_ray_segment(self, angle: float, ray: Ray) -> Segment:
-        v = Vector(math.cos(angle), math.sin(angle))
-        v = v.scale_to(self.width * self.height)
-        x, y = ray.points[-1]
-        ray_segment = DirectedSegment((x, y), (x + v.x, y + v.y))
-        return ray_segment
+        return self.emit_from(np.array([[particle.r.x, particle.r.y]]), mirrors)
+
+    def emit_from(self, positions: np.ndarray, mirrors: List[PlaneMirror]) -> RayBundle:
+        """
+        Emit rays from several points at once
+        :param positions: positions of the emitters, array of shape (n, 2)
+        :param mirrors: mirrors of the world
+        :return: rays, the rays of each emitter being consecutive
+        """
+        angles = np.arange(self.n_rays) * (2 * math.pi / self.n_rays)
+        directions = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        origins = np.repeat(positions, self.n_rays, axis=0)
+        return self.trace(origins, np.tile(directions, (len(positions), 1)), mirrors)
+
+    def trace(self, origins: np.ndarray, directions: np.ndarray, mirrors: List[PlaneMirror]) -> RayBundle:
+        """
+        Trace rays bouncing on the mirrors until they reach the border of the world
+        :param origins: starting points of the rays, array of shape (k, 2)
+        :param directions: unit directions of the rays, array of shape (k, 2)
+        :param mirrors: mirrors of the world
+        :return: rays, in the order of the origins
+        """
+        self._update_mirrors(mirrors)
+        return self._trace_rays(origins, directions)
+
+    def _trace_rays(self, origins: np.ndarray, directions: np.ndarray) -> RayBundle:
+        """ Trace rays on the current segments, by chunks bounding the memory used """
+        n_tested_mirrors = 1 if self._bvh is not None else max(1, len(self._segments))
+        chunk_size = max(1, RayEmitter.max_n_pairs // n_tested_mirrors)
+        return RayBundle.concatenate([self._trace_chunk(origins[i0:i0 + chunk_size], directions[i0:i0 + chunk_size])
+                                      for i0 in range(0, len(origins), chunk_size)])
+
+    def accumulate(self, positions: np.ndarray, mirrors: List[PlaneMirror], grid: RadianceGrid, n_rays: int = None,
+                   power: float = 1.) -> None:
+        """
+        Emit rays from several points and accumulate them in a radiance grid instead of returning them. Rays are traced
+        by batches and dropped once accumulated, so that the memory used does not depend on the number of rays.
+        :param positions: positions of the emitters, array of shape (n, 2)
+        :param mirrors: mirrors of the world
+        :param grid: grid the rays are accumulated in
+        :param n_rays: number of rays emitted by each emitter, n_rays of the emitter by default
+        :param power: power of each emitter, shared between its rays
+        """
+        self._update_mirrors(mirrors)
+        n_rays = n_rays or self.n_rays
+
+        n_tested_mirrors = 1 if self._bvh is not None else max(1, len(self._segments))
+        batch_size = max(1, min(RayEmitter.max_n_rays_per_batch, RayEmitter.max_n_pairs // n_tested_mirrors))
+        n_total = len(positions) * n_rays
+        for i0 in range(0, n_total, batch_size):
+            indices = np.arange(i0, min(i0 + batch_size, n_total))
+            angles = (indices % n_rays) * (2 * math.pi / n_rays)
+            origins = positions[indices // n_rays]
+            directions = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+            previous = origins.copy()
+            for active, points in self._bounces(origins, directions):
+                grid.add_segments(previous[active], points, power / n_rays)
+                previous[active] = points
+
+    def _update_mirrors(self, mirrors: List[PlaneMirror]) -> None:
+        key = get_mirrors_key(mirrors)
+        if key == self._mirrors_key:
+            return
+
+        segments = [[m.segment.x0(), m.segment.y0(), m.segment.x1(), m.segment.y1()] for m in mirrors]
+        self._set_segments(key, np.array(segments, dtype=float).reshape(-1, 4))
+
+    def _set_segments(self, key, segments: np.ndarray) -> None:
+        """ Set the segments of the mirrors, array of shape (n, 4), and build what is derived from them """
+        self._mirrors_key = key
+        self._segments = segments
+        self._bvh = SegmentBVH(segments) if len(segments) >= RayEmitter.min_n_mirrors_for_bvh else None
+
+    def _trace_chunk(self, origins: np.ndarray, directions: np.ndarray) -> RayBundle:
+        bounces = list(self._bounces(origins, directions))
+
+        # the point of ray i at its bounce b goes to row offsets[i] + b, rays still travelling at a bounce having
+        # travelled at every previous one
+        counts = np.ones(len(origins), dtype=np.int64)
+        for active, _ in bounces:
+            counts[active] += 1
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        points = np.empty((offsets[-1], 2))
+        points[offsets[:-1]] = origins
+        for b, (active, bounce_points) in enumerate(bounces, start=1):
+            points[offsets[active] + b] = bounce_points
+        return RayBundle(points, offsets)
+
+    def _bounces(self, origins: np.ndarray, directions: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Trace rays on the current segments, yielding at each bounce the indices of the rays still travelling and the
+        points where they are reflected or reach the border of the world
+        """
+        p0 = self._segments[:, :2]
+        e = self._segments[:, 2:] - p0
+        normals = normal_vectors(e)
+
+        active = np.arange(len(origins))
+        o, d = origins, directions
+        last_mirror = np.full(len(origins), -1)
+
+        for _ in range(RayEmitter.max_n_segments):
+            t_border = self._distance_to_border(o, d)
+            if self._bvh is not None and len(o) * len(self._segments) >= RayEmitter.min_n_pairs_for_bvh:
+                t_mirror, mirror = self._bvh.closest_hit(o, d, last_mirror)
+            else:
+                t_mirror, mirror = self._closest_mirror(o, d, p0, e, last_mirror)
+
+            is_reflected = t_mirror < t_border
+            t = np.where(is_reflected, t_mirror, t_border)
+            points = o + d * t[:, np.newaxis]
+            yield active, points
+
+            active = active[is_reflected]
+            if not len(active):
+                return
+
+            o = points[is_reflected]
+            n = normals[mirror[is_reflected]]
+            d = reflect(d[is_reflected], n)
+            last_mirror = mirror[is_reflected]
+
+    def _distance_to_border(self, o: np.ndarray, d: np.ndarray) -> np.ndarray:
+        """ Return the distance along each ray to the border of the world, rays starting inside the world """
+        upper = np.array([self.width, self.height])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(d > 0, (upper - o) / d, np.where(d < 0, -o / d, np.inf))
+        return np.maximum(t.min(axis=1), 0.)
+
+    @staticmethod
+    def _closest_mirror(o: np.ndarray, d: np.ndarray, p0: np.ndarray, e: np.ndarray, last_mirror: np.ndarray) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return for each ray the distance to the closest mirror it hits and the index of this mirror, inf and -1 if
+        none. The mirror a ray has just been reflected on is ignored.
+        """
+        if not len(p0):
+            return np.full(len(o), np.inf), np.full(len(o), -1)
+
+        return closest_ray_segment_hits(o, d, p0[np.newaxis], e[np.newaxis], np.arange(len(p0))[np.newaxis],
+                                        last_mirror)
+
+
+class RayCache:
+    """
+    Class caching the rays traced from each emitter. Rays of an emitter are reused as long as it stays within a
+    tolerance of the position they were traced from and the mirrors do not change. Least recently used emitters are
+    evicted beyond the capacity.
+
+    The default tolerance is below a pixel at the usual zooms, so that slow emitters reuse their rays for several
+    frames. With a null tolerance, only emitters which do not move at all reuse their rays.
+    """
+
+    def __init__(self, capacity: int = 4096, tolerance: float = 0.5):
+        """
+        :param capacity: maximum number of emitters whose rays are kept
+        :param tolerance: distance along each axis an emitter can move and still reuse its rays, in world units. Rays
+        reused this way start up to this distance away from their emitter
+        """
+        self.capacity = capacity
+        self.tolerance = tolerance
+        self.entries = OrderedDict()  # emitter id -> (x, y, key of the tracing, ray bundle)
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.
+
+    def reset_statistics(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def _is_close(self, x0: float, y0: float, x1: float, y1: float) -> bool:
+        return abs(x0 - x1) <= self.tolerance and abs(y0 - y1) <= self.tolerance
+
+    def emit(self, emitter: RayEmitter, ids: list, positions: np.ndarray, mirrors: List[PlaneMirror]) -> RayBundle:
+        """
+        Return the rays of several emitters, tracing only those not found in the cache
+        :param emitter: ray emitter used to trace the missing rays
+        :param ids: identifier of each emitter
+        :param positions: positions of the emitters, array of shape (n, 2)
+        :param mirrors: mirrors of the world
+        :return: rays, the rays of each emitter being consecutive
+        """
+        key = (get_mirrors_key(mirrors), emitter.n_rays, emitter.width, emitter.height)
+
+        rays_by_emitter = [None] * len(ids)
+        missing = []
+        for i, (emitter_id, (x, y)) in enumerate(zip(ids, positions.tolist())):
+            entry = self.entries.get(emitter_id)
+            if entry and entry[2] == key and self._is_close(entry[0], entry[1], x, y):
+                self.entries.move_to_end(emitter_id)
+                rays_by_emitter[i] = entry[3]
+            else:
+                missing.append(i)
+
+        self.hits += len(ids) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            traced = emitter.emit_from(positions[missing], mirrors)
+            for j, i in enumerate(missing):
+                rays = traced[j * emitter.n_rays:(j + 1) * emitter.n_rays].copy()
+                x, y = positions[i]
+                self.entries[ids[i]] = (float(x), float(y), key, rays)
+                self.entries.move_to_end(ids[i])
+                rays_by_emitter[i] = rays
+
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+        return RayBundle.concatenate(rays_by_emitter)
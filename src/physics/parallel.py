@@ -0,0 +1,93 @@
+import concurrent.futures
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from src.physics.optics import PlaneMirror, RayBundle, RayEmitter
+
+_worker_emitter: Optional[RayEmitter] = None  # emitter of a worker process, holding the mirrors it was started with
+
+
+def _init_worker(width: float, height: float, n_rays: int, key, segments: np.ndarray) -> None:
+    global _worker_emitter
+    _worker_emitter = RayEmitter(width, height, n_rays)
+    _worker_emitter._set_segments(key, segments)
+
+
+def _trace_in_worker(origins: np.ndarray, directions: np.ndarray) -> RayBundle:
+    return _worker_emitter._trace_rays(origins, directions)
+
+
+class ParallelRayEmitter(RayEmitter):
+    """
+    Ray emitter sharding the rays across a pool of workers, every ray being independent from the others.
+
+    With processes, the mirrors are sent to the workers when the pool starts, and the pool is only restarted when the
+    mirrors change: each frame only sends the origins and directions of the rays. Threads share the mirrors of the
+    emitter, but only run in parallel while numpy releases the GIL. Few rays are traced serially, as the cost of
+    dispatching them would exceed the gain.
+
+    Only the rays returned by emit and emit_from are traced in parallel: accumulate, filling a radiance grid, is
+    inherited from RayEmitter and still runs serially.
+    """
+
+    backends = ("process", "thread")
+    min_n_rays_per_worker = 512  # below, sharding costs more than it saves
+
+    def __init__(self, width, height, n_rays: int = 16, *, n_workers: int = None, backend: str = "process"):
+        """
+        :param n_rays: number of rays emitted by each emitter, evenly spread around it
+        :param n_workers: number of workers, the number of processors by default. With 1 worker, rays are traced
+        serially. Keyword only, so that it cannot be mistaken for n_rays
+        :param backend: "process" or "thread", keyword only
+        """
+        super().__init__(width, height, n_rays)
+        if backend not in ParallelRayEmitter.backends:
+            raise ValueError("Unknown backend {}, expected one of {}".format(backend, ParallelRayEmitter.backends))
+
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.backend = backend
+
+        self._pool = None
+        self._pool_key = None  # key of the mirrors the process pool was started with
+
+    def trace(self, origins: np.ndarray, directions: np.ndarray, mirrors: List[PlaneMirror]) -> RayBundle:
+        self._update_mirrors(mirrors)
+
+        n_shards = min(self.n_workers, len(origins) // ParallelRayEmitter.min_n_rays_per_worker)
+        if n_shards <= 1:
+            return self._trace_rays(origins, directions)
+
+        pool = self._get_pool()
+        trace = self._trace_rays if self.backend == "thread" else _trace_in_worker
+        bounds = np.linspace(0, len(origins), n_shards + 1).astype(int)
+        futures = [pool.submit(trace, origins[i0:i1], directions[i0:i1]) for i0, i1 in zip(bounds[:-1], bounds[1:])]
+        return RayBundle.concatenate([future.result() for future in futures])
+
+    def close(self) -> None:
+        """ Stop the workers, they are started again when needed """
+        if self._pool is not None:
+            self._pool.shutdown()
+        self._pool = None
+        self._pool_key = None
+
+    def __enter__(self) -> "ParallelRayEmitter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_pool(self) -> concurrent.futures.Executor:
+        if self.backend == "thread":
+            if self._pool is None:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self.n_workers)
+            return self._pool
+
+        if self._pool is None or self._pool_key != self._mirrors_key:
+            self.close()
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                self.n_workers, initializer=_init_worker,
+                initargs=(self.width, self.height, self.n_rays, self._mirrors_key, self._segments))
+            self._pool_key = self._mirrors_key
+        return self._pool
@@ -0,0 +1,63 @@
+from typing import Tuple
+
+import numpy as np
+
+from src.mathematics import squared_lengths
+
+
+class RadianceGrid:
+    """
+    Grid over the world accumulating the light of the rays crossing each cell: a segment of ray adds its power times
+    the length it travels in the cell. Segments are rasterized by sampling points along them, at most half a cell
+    apart, so that rays of any number can be accumulated without being kept.
+    """
+
+    max_n_samples = 2 ** 20  # maximum number of points sampled at once, bounds the memory used
+
+    def __init__(self, width: float, height: float, resolution: Tuple[int, int] = (256, 256)):
+        """
+        :param width: width of the world
+        :param height: height of the world
+        :param resolution: number of cells along x and y
+        """
+        self.width, self.height = width, height
+        self.nx, self.ny = resolution
+        self.cell_w, self.cell_h = width / self.nx, height / self.ny
+        self.sample_step = min(self.cell_w, self.cell_h) / 2
+
+        self.intensity = np.zeros((self.ny, self.nx))  # indexed by [iy, ix], iy growing with y
+
+    def clear(self) -> None:
+        self.intensity[:] = 0.
+
+    def add_segments(self, p0: np.ndarray, p1: np.ndarray, power: np.ndarray) -> None:
+        """
+        Accumulate segments of rays in the grid
+        :param p0: first points of the segments, array of shape (n, 2)
+        :param p1: second points of the segments, array of shape (n, 2)
+        :param power: power carried by each segment, array of shape (n,) or scalar
+        """
+        e = p1 - p0
+        lengths = np.sqrt(squared_lengths(e))
+        counts = np.maximum(np.ceil(lengths / self.sample_step), 1).astype(np.int64)
+        weights = np.broadcast_to(power, lengths.shape) * lengths / counts
+        ends = np.cumsum(counts)
+
+        i0 = 0
+        while i0 < len(counts):
+            n_before = ends[i0 - 1] if i0 else 0
+            i1 = max(i0 + 1, int(np.searchsorted(ends, n_before + RadianceGrid.max_n_samples, side="right")))
+            self._add_samples(p0[i0:i1], e[i0:i1], counts[i0:i1], weights[i0:i1])
+            i0 = i1
+
+    def _add_samples(self, p0: np.ndarray, e: np.ndarray, counts: np.ndarray, weights: np.ndarray) -> None:
+        """ Add the middles of the counts equal pieces of each segment, each weighing the weight of its segment """
+        segment = np.repeat(np.arange(len(counts)), counts)
+        k = np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)
+        f = (k + 0.5) / counts[segment]
+        points = p0[segment] + f[:, np.newaxis] * e[segment]
+
+        ix = np.clip((points[:, 0] / self.cell_w).astype(np.int64), 0, self.nx - 1)
+        iy = np.clip((points[:, 1] / self.cell_h).astype(np.int64), 0, self.ny - 1)
+        cells = np.bincount(iy * self.nx + ix, weights=weights[segment], minlength=self.nx * self.ny)
+        self.intensity += cells.reshape(self.ny, self.nx)
@@ -1,11 +1,277 @@
 import uuid
-from typing import Tuple
+from typing import Optional, Tuple
 
-import pygame
+import numpy as np
 
-from src.mathematics import Vector
+from src.mathematics import Rect, Vector
+from src.physics.integrators import Integrator, SemiImplicitEuler
 from src.physics.mechanics import Particle
-from src.physics.optics import RayEmitter
+from src.physics.optics import MirrorList, RayBundle, RayCache, RayEmitter, get_mirrors_key
+from src.physics.radiance import RadianceGrid
+
+
+class ParticleStore:
+    """
+    Class holding the state of every particle of a world in contiguous arrays, one row per particle, as a pool:
+    removed particles are replaced by the last rows, so that the rows stay compact, and each particle has an integer
+    handle, reused once the particle is removed, giving its row whatever the moves.
+
+    Particles added to the store become views onto their row. Particles spawned in bulk only get a view when first
+    accessed.
+    """
+
+    initial_capacity = 64
+
+    def __init__(self):
+        self.n = 0
+        self.version = 0  # changed whenever the state of a particle changes
+        self.is_acceleration_current = False  # whether a holds the accelerations at the current positions
+
+        self._views = []  # particle views, aligned with the rows of the arrays, None until first accessed
+        self._free_handles = []  # handles of removed particles, to be reused
+        self._row_of_handle = np.zeros(0, dtype=np.int64)  # row of each handle, -1 if free
+        self._handle_of_id = {}  # handle of each particle by id
+        self._n_handles = 0  # number of handles ever allocated
+
+        self._r = np.zeros((ParticleStore.initial_capacity, 2))
+        self._r_previous = np.zeros((ParticleStore.initial_capacity, 2))
+        self._v = np.zeros((ParticleStore.initial_capacity, 2))
+        self._a = np.zeros((ParticleStore.initial_capacity, 2))
+        self._m = np.zeros(ParticleStore.initial_capacity)
+        self._t = np.zeros(ParticleStore.initial_capacity)
+        self._id = np.zeros(ParticleStore.initial_capacity, dtype=np.int64)
+        self._handle = np.zeros(ParticleStore.initial_capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def r(self) -> np.ndarray:
+        """ Positions, array of shape (n, 2) """
+        return self._r[:self.n]
+
+    @property
+    def r_previous(self) -> np.ndarray:
+        """ Positions before the last step, array of shape (n, 2) """
+        return self._r_previous[:self.n]
+
+    @property
+    def v(self) -> np.ndarray:
+        """ Velocities, array of shape (n, 2) """
+        return self._v[:self.n]
+
+    @property
+    def a(self) -> np.ndarray:
+        """ Accelerations, array of shape (n, 2) """
+        return self._a[:self.n]
+
+    @property
+    def m(self) -> np.ndarray:
+        """ Masses, array of shape (n,) """
+        return self._m[:self.n]
+
+    @property
+    def t(self) -> np.ndarray:
+        """ Living durations in seconds, array of shape (n,) """
+        return self._t[:self.n]
+
+    @property
+    def ids(self) -> np.ndarray:
+        """ Ids of the particles, array of shape (n,) """
+        return self._id[:self.n]
+
+    @property
+    def handles(self) -> np.ndarray:
+        """ Handles of the particles, array of shape (n,) """
+        return self._handle[:self.n]
+
+    @property
+    def particles(self) -> Tuple[Particle, ...]:
+        """ Particle views, aligned with the rows of the arrays """
+        return tuple(self.particle(i) for i in range(self.n))
+
+    def particle(self, row: int) -> Particle:
+        """ Return the particle view onto a row, created if needed """
+        p = self._views[row]
+        if p is None:
+            p = Particle(Vector(), Vector(), 0.)
+            p.id = int(self._id[row])
+            p.bind(self, row)
+            self._views[row] = p
+        return p
+
+    def row(self, handle: int) -> int:
+        """ Return the row of the particle with the given handle """
+        row = int(self._row_of_handle[handle]) if 0 <= handle < self._n_handles else -1
+        if row < 0:
+            raise KeyError("No particle with handle {}".format(handle))
+        return row
+
+    def row_of_id(self, id: int) -> int:
+        """ Return the row of the particle with the given id """
+        handle = self._handle_of_id.get(id)
+        if handle is None:
+            raise KeyError("No particle with id {}".format(id))
+        return int(self._row_of_handle[handle])
+
+    def add(self, p: Particle) -> None:
+        """
+        Copy the state of the particle in a new row and make the particle a view onto it
+        :param p: particle to be added
+        """
+        r, v, a = p.r, p.v, p.a
+        i = self.n
+        self.spawn(np.array([[r.x, r.y]]), np.array([[v.x, v.y]]), p.m, ids=np.array([p.id]))
+        self._a[i] = a.x, a.y
+        self._t[i] = p.t
+
+        p.bind(self, i)
+        self._views[i] = p
+
+    def spawn(self, r: np.ndarray, v: np.ndarray, m, ids: np.ndarray = None) -> np.ndarray:
+        """
+        Add many particles at once, without creating particle objects
+        :param r: positions, array of shape (k, 2)
+        :param v: velocities, array of shape (k, 2)
+        :param m: masses, array of shape (k,) or scalar
+        :param ids: ids of the particles, new ids by default
+        :return: handles of the particles, array of shape (k,)
+        """
+        k = len(r)
+        while self.n + k > len(self._m):
+            self._grow()
+
+        rows = slice(self.n, self.n + k)
+        self._r[rows] = r
+        self._r_previous[rows] = r
+        self._v[rows] = v
+        self._a[rows] = 0.
+        self._m[rows] = m
+        self._t[rows] = 0.
+        self._id[rows] = np.arange(Particle.reserve_ids(k), Particle._next_id) if ids is None else ids
+
+        handles = self._allocate_handles(k)
+        self._handle[rows] = handles
+        self._row_of_handle[handles] = np.arange(self.n, self.n + k)
+        self._handle_of_id.update(zip(self._id[rows].tolist(), handles.tolist()))
+        self._views.extend([None] * k)
+
+        self.n += k
+        self.version += 1
+        self.is_acceleration_current = False
+        return handles
+
+    def keep(self, mask: np.ndarray) -> None:
+        """
+        Remove every particle whose entry in mask is False
+        :param mask: boolean array of shape (n,)
+        """
+        self.remove_rows(np.flatnonzero(~mask))
+
+    def remove(self, handles: np.ndarray) -> None:
+        """
+        Remove the particles with the given handles. Nothing is removed if one of them is not the handle of a particle.
+        :param handles: handles of the particles, array of shape (k,)
+        """
+        handles = np.asarray(handles, dtype=np.int64).reshape(-1)
+        is_valid = (handles >= 0) & (handles < self._n_handles)
+        if not is_valid.all():
+            raise KeyError("No particle with handle {}".format(handles[~is_valid][0]))
+
+        rows = self._row_of_handle[handles]
+        if (rows < 0).any():
+            raise KeyError("No particle with handle {}".format(handles[rows < 0][0]))
+        self.remove_rows(np.unique(rows))
+
+    def clear(self) -> None:
+        """ Remove every particle """
+        self.remove_rows(np.arange(self.n))
+
+    def remove_rows(self, rows: np.ndarray) -> None:
+        """
+        Remove the particles of the given rows, in a time proportional to their number: the last rows kept are moved
+        into the holes left. Removed particles are detached from the store and their handles freed.
+        :param rows: sorted distinct rows, array of shape (k,)
+        """
+        if not len(rows):
+            return
+
+        for i in rows.tolist():
+            if self._views[i] is not None:
+                self._views[i].unbind()
+
+        handles = self._handle[rows]
+        self._row_of_handle[handles] = -1
+        for id in self._id[rows].tolist():
+            self._handle_of_id.pop(id, None)
+        self._free_handles.extend(handles.tolist())
+
+        n = self.n - len(rows)
+        holes = rows[rows < n]
+        is_moved = np.ones(self.n - n, dtype=bool)
+        is_moved[rows[rows >= n] - n] = False
+        moved = np.flatnonzero(is_moved) + n
+
+        for array in (self._r, self._r_previous, self._v, self._a, self._m, self._t, self._id, self._handle):
+            array[holes] = array[moved]
+        self._row_of_handle[self._handle[holes]] = holes
+
+        for hole, row in zip(holes.tolist(), moved.tolist()):
+            p = self._views[row]
+            if p is not None:
+                p.bind(self, hole)
+            self._views[hole] = p
+        del self._views[n:]
+
+        self.n = n
+        self.version += 1
+        self.is_acceleration_current = False  # forces between particles changed
+
+    def step(self, dt: float, integrator: Integrator, acceleration) -> None:
+        """
+        Advance every particle following Newton mechanics
+        :param dt: evolution time in seconds
+        :param integrator: numerical scheme used to advance the particles
+        :param acceleration: function returning the accelerations, array of shape (n, 2), for given positions and
+        velocities
+        """
+        self.version += 1
+        self.r_previous[:] = self.r
+        integrator.step(self, dt, acceleration)
+        self.t[:] += dt
+
+    def interpolated_r(self, alpha: float) -> np.ndarray:
+        """
+        Return the positions interpolated between the two last steps
+        :param alpha: 0 gives the positions before the last step, 1 the current positions
+        :return: positions, array of shape (n, 2)
+        """
+        return self.r_previous + alpha * (self.r - self.r_previous)
+
+    def _allocate_handles(self, k: int) -> np.ndarray:
+        """ Return k handles, reusing the freed ones first """
+        n_reused = min(k, len(self._free_handles))
+        reused = self._free_handles[len(self._free_handles) - n_reused:]
+        del self._free_handles[len(self._free_handles) - n_reused:]
+
+        n_handles = self._n_handles
+        self._n_handles += k - n_reused
+        if self._n_handles > len(self._row_of_handle):
+            capacity = max(self._n_handles, 2 * len(self._row_of_handle), ParticleStore.initial_capacity)
+            self._row_of_handle = np.concatenate([self._row_of_handle,
+                                                  np.full(capacity - len(self._row_of_handle), -1, dtype=np.int64)])
+        return np.concatenate([np.array(reused, dtype=np.int64), np.arange(n_handles, self._n_handles)])
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._m)
+        self._r = np.resize(self._r, (capacity, 2))
+        self._r_previous = np.resize(self._r_previous, (capacity, 2))
+        self._v = np.resize(self._v, (capacity, 2))
+        self._a = np.resize(self._a, (capacity, 2))
+        self._m = np.resize(self._m, capacity)
+        self._t = np.resize(self._t, capacity)
+        self._id = np.resize(self._id, capacity)
+        self._handle = np.resize(self._handle, capacity)
 
 
 class World:
@@ -14,61 +280,170 @@ class World:
     functions to add or remove entities in the world
     """
 
-    def __init__(self, dim: Tuple[int, int]):
-        self.rect = pygame.Rect((0, 0), dim)
-        self.particles = []
-        self.mirrors = []
-        self.rays = []
+    def __init__(self, dim: Tuple[int, int], integrator: Integrator = None):
+        """
+        :param dim: dimension of the world
+        :param integrator: numerical scheme used to advance the particles, semi implicit Euler by default
+        """
+        self.rect = Rect((0, 0), dim)
+        self.store = ParticleStore()
+        self._mirrors = MirrorList()
         self.forces = []
+        self._forces_key = ()  # forces and versions the accelerations of the store were computed with
+        self._forces_version = 0  # incremented by invalidate_forces
+        self.integrator = integrator or SemiImplicitEuler()
         self.id = uuid.uuid1()
         self.t = 0
 
         self.is_removed_if_out_of_world = True
 
+        self.ray_emitter = RayEmitter(self.rect.w, self.rect.h)
+        self.ray_cache = RayCache()
+        self._rays = RayBundle()
+        self._rays_key = None  # state of the world the rays were traced for
+
+        self.recorders = []  # objects whose record method is called with the world after each step
+
+        self.radiance_grid = None  # if set, the light of n_radiance_rays rays per particle is accumulated in it
+        self.n_radiance_rays = 10 ** 4
+        self._radiance_key = None  # state of the world the radiance was accumulated for
+
+    @property
+    def particles(self) -> Tuple[Particle, ...]:
+        """
+        Particles of the world, as views onto the particle store. The tuple is built on each access: particles are
+        added and removed with add_particle and remove_particle, or spawn and remove for many at once.
+        """
+        return self.store.particles
+
+    @property
+    def mirrors(self) -> MirrorList:
+        """ Mirrors of the world """
+        return self._mirrors
+
+    @mirrors.setter
+    def mirrors(self, mirrors) -> None:
+        self._mirrors = MirrorList(mirrors)
+
+    @property
+    def rays(self) -> RayBundle:
+        """
+        Rays emitted by the particles, traced when first read after a change of the particles, the mirrors or the
+        emitter
+        """
+        return self.get_rays()
+
+    def get_rays(self, viewport: Rect = None) -> RayBundle:
+        """
+        Return the rays emitted by the particles. They are only traced when the particles, the mirrors or the emitter
+        changed since the previous call.
+        :param viewport: if given, only the particles inside this rectangle emit rays
+        """
+        viewport_key = None if viewport is None else (viewport.x, viewport.y, viewport.w, viewport.h)
+        key = (self.store.version, get_mirrors_key(self.mirrors), viewport_key, id(self.ray_emitter),
+               self.ray_emitter.n_rays)
+        if key == self._rays_key:
+            return self._rays
+
+        ids, positions = self.store.ids, self.store.r
+        if viewport is not None:
+            is_inside = ((positions >= (viewport.x, viewport.y))
+                         & (positions <= (viewport.x + viewport.w, viewport.y + viewport.h))).all(axis=1)
+            ids, positions = ids[is_inside], positions[is_inside]
+
+        self._rays = self.ray_cache.emit(self.ray_emitter, ids.tolist(), positions, self.mirrors)
+        self._rays_key = key
+        return self._rays
+
+    @property
+    def radiance(self) -> Optional[RadianceGrid]:
+        """
+        Radiance grid of the world, accumulated when first read after a change of the particles or mirrors. None if
+        no grid is set.
+        """
+        if self.radiance_grid is None:
+            return None
+
+        key = (self.store.version, get_mirrors_key(self.mirrors), id(self.radiance_grid), self.n_radiance_rays,
+               id(self.ray_emitter))
+        if key != self._radiance_key:
+            self.radiance_grid.clear()
+            self.ray_emitter.accumulate(self.store.r, self.mirrors, self.radiance_grid, self.n_radiance_rays)
+            self._radiance_key = key
+        return self.radiance_grid
+
     def add_particle(self, p: Particle) -> None:
         """
         :param p: particle to be added to the world
         """
-        self.particles.append(p)
+        self.store.add(p)
+
+    def remove_particle(self, p: Particle) -> None:
+        """
+        :param p: particle of the world to be removed
+        """
+        if p.handle < 0:
+            raise ValueError("The particle {} is not in a world".format(p.id))
+        self.store.remove(np.array([p.handle]))
+
+    def spawn(self, r: np.ndarray, v: np.ndarray, m=1.) -> np.ndarray:
+        """
+        Add many particles at once, much faster than adding them one by one
+        :param r: positions, array of shape (k, 2)
+        :param v: velocities, array of shape (k, 2)
+        :param m: masses, array of shape (k,) or scalar
+        :return: handles of the particles, array of shape (k,), to find or remove them in the store
+        """
+        return self.store.spawn(np.asarray(r, dtype=float).reshape(-1, 2), np.asarray(v, dtype=float).reshape(-1, 2), m)
+
+    def remove(self, handles: np.ndarray) -> None:
+        """
+        Remove particles from the world
+        :param handles: handles of the particles, array of shape (k,)
+        """
+        self.store.remove(np.asarray(handles, dtype=np.int64))
+
+    def invalidate_forces(self) -> None:
+        """
+        Make the next step compute the accelerations again. Changes of the list of forces and assignments of their
+        attributes are detected, this is only needed after changing a force in place, e.g. force.center.x = 0.
+        """
+        self._forces_version += 1
 
     def update(self, dt: float) -> None:
         """
-        Evolve the world for a given amount of time
+        Evolve the world for a given amount of time. Rays are not traced here but when they are read.
         :param dt: evolution time in seconds
         """
         self.t += dt
 
-        forces = []
-        for p in self.particles:
-            forces.append(self._compute_force_on(p))
+        forces_key = (self._forces_version,) + tuple((id(force), force.version) for force in self.forces)
+        if forces_key != self._forces_key:
+            self.store.is_acceleration_current = False
+            self._forces_key = forces_key
 
-        for i, p in enumerate(self.particles):
-            p.update(dt, forces[i])
-            self._handle_out_of_world(p)
+        self.store.step(dt, self.integrator, self._compute_accelerations)
+        self._handle_out_of_world()
 
-        self._emit_rays()
+        for recorder in self.recorders:
+            recorder.record(self)
 
-    def _compute_force_on(self, p: Particle) -> Vector:
-        f = Vector()
+    def _compute_accelerations(self, r: np.ndarray, v: np.ndarray) -> np.ndarray:
+        m = self.store.m
+        f = np.zeros((len(m), 2))
         for force in self.forces:
-            f += force.apply_on(p)
-        return f
+            f += force.apply_on_batch(r, v, m)
+        return f / m[:, np.newaxis]
 
-    def _handle_out_of_world(self, p: Particle) -> None:
+    def _handle_out_of_world(self) -> None:
+        r = self.store.r
+        dim = np.array([self.rect.w, self.rect.h])
 
         if self.is_removed_if_out_of_world:
-
-            if not 0 <= p.r.x <= self.rect.w:
-                self.particles.remove(p)
-                return
-
-            if not 0 <= p.r.y <= self.rect.h:
-                self.particles.remove(p)
+            self.store.keep(((0 <= r) & (r <= dim)).all(axis=1))
         else:
-            p.r.x %= self.rect.w
-            p.r.y %= self.rect.h
-
-    def _emit_rays(self) -> None:
-        ray_emitter = RayEmitter(self.rect.w, self.rect.h)
-        self.rays = [ray_emitter.emit(p, self.mirrors) for p in self.particles]
-        self.rays = [y for x in self.rays for y in x]
+            shift = r - (r % dim)
+            if shift.any():
+                r -= shift
+                self.store.r_previous[:] -= shift
+                self.store.is_acceleration_current = False
@@ -1,52 +1,83 @@
-from typing import Tuple
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
 
+import numpy as np
 import pygame
 
-pygame.init()
 n_x_tick = 5
 n_y_tick = 5
 
 tick_width = 3
 
+background_color = (0, 0, 0)
 ax_color = (255, 255, 255)
-point_color = (255, 255, 255)
-point_size = 2
+line_color = (255, 255, 255)
+line_width = 2
 margin_ratio = 10 / 100
 
-tick_label_font = pygame.font.SysFont("comicsansms", 8)
+font_name = "comicsansms"
+tick_label_size = 8
 tick_label_color = (255, 255, 255)
 tick_label_format = '{:3.0f}'
 
-title_font = pygame.font.SysFont("comicsansms", 12)
+title_size = 12
 title_color = (255, 255, 255)
 
+max_cached_texts = 1024
+max_cached_frames = 64
 
-def _draw_x_ticks(plot_surf, p0, p1, x_range):
+_fonts: Dict[int, pygame.font.Font] = {}
+_texts = OrderedDict()  # rendered texts by font size, string and color, least recently used first
+_frames = OrderedDict()  # rendered axes, ticks and titles of plots by size, title and tick labels, same order
+
+
+def get_font(size: int) -> pygame.font.Font:
+    """ Return the font of the given size, loaded on first use"""
+    if size not in _fonts:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        _fonts[size] = pygame.font.SysFont(font_name, size)
+    return _fonts[size]
+
+
+def render_text(text: str, size: int, color: Tuple[int, int, int]) -> pygame.Surface:
+    """ Return the surface of a text rendered with the font of the given size, kept for the next calls """
+    key = (size, text, color)
+    surf = _texts.get(key)
+    if surf is None:
+        surf = get_font(size).render(text, True, color)
+        _texts[key] = surf
+        if len(_texts) > max_cached_texts:
+            _texts.popitem(last=False)
+    _texts.move_to_end(key)
+    return surf
+
+
+def _get_tick_labels(value_range, n_tick):
+    minv, maxv = value_range
+    return tuple(tick_label_format.format(minv + tick_index * (maxv - minv) / (n_tick + 1))
+                 for tick_index in range(1, n_tick + 1))
+
+
+def _draw_x_ticks(plot_surf, p0, p1, labels):
     x0, y0 = p0
     x1, y1 = p1
-    minx, maxx = x_range
-
-    for tick_index in range(1, n_x_tick + 1):
+    for tick_index, x_label in enumerate(labels, start=1):
         x_tick = int(tick_index * (x1 - x0) / (n_x_tick + 1)) + x0
         pygame.draw.line(plot_surf, ax_color, (x_tick, y0 - tick_width), (x_tick, y0 + tick_width))
 
-        x = (tick_index * (maxx - minx) / (n_x_tick + 1)) + minx
-        x_label = tick_label_format.format(x)
-        text = tick_label_font.render(x_label, True, tick_label_color)
+        text = render_text(x_label, tick_label_size, tick_label_color)
         plot_surf.blit(text, (x_tick, y0 + tick_width))
 
 
-def _draw_y_ticks(plot_surf, p0, p1, y_range):
+def _draw_y_ticks(plot_surf, p0, p1, labels):
     x0, y0 = p0
     x1, y1 = p1
-    miny, maxy = y_range
-    for tick_index in range(1, n_y_tick + 1):
+    for tick_index, y_label in enumerate(labels, start=1):
         y_tick = y0 - int(tick_index * (y0 - y1) / (n_y_tick + 1))
         pygame.draw.line(plot_surf, ax_color, (x0 - tick_width, y_tick), (x0 + tick_width, y_tick))
 
-        y = miny + (tick_index * (maxy - miny) / (n_x_tick + 1))
-        y_label = tick_label_format.format(y)
-        text = tick_label_font.render(y_label, True, tick_label_color)
+        text = render_text(y_label, tick_label_size, tick_label_color)
         plot_surf.blit(text, (x0 - tick_width - text.get_rect().width, y_tick))
 
 
@@ -57,53 +88,99 @@ def _draw_axis(surf: pygame.Surface, p0: Tuple[int, int], p1: Tuple[int, int]) -
     pygame.draw.line(surf, ax_color, (x0, y0), (x0, y1))
 
 
-def _draw_points(surf: pygame.Surface, xs, ys, p0, p1, minx, miny, lx, ly):
+def _draw_envelope(surf: pygame.Surface, xs: np.ndarray, ys_min: np.ndarray, ys_max: np.ndarray, p0, p1, minx, miny,
+                   lx, ly):
+    """
+    Draw data as one polyline going through the minimum and maximum of the data falling in each column of pixels, so
+    that the cost of drawing depends on the width of the plot and not on the size of the data
+    """
     x0, y0 = p0
     x1, y1 = p1
 
-    previous_x_pixel, previous_y_pixel = 0, 0
-
-    for p in zip(xs, ys):
-        x, y = p
-        x_pixel = int(x0 + (((x - minx) / lx) * (x1 - x0)))
-        y_pixel = int(y0 + (((y - miny) / ly) * (y1 - y0)))
+    columns = np.clip(((xs - minx) / lx * (x1 - x0)).astype(np.int64), 0, x1 - x0)
+    lows = np.full(x1 - x0 + 1, np.inf)
+    highs = np.full(x1 - x0 + 1, -np.inf)
+    np.minimum.at(lows, columns, ys_min)
+    np.maximum.at(highs, columns, ys_max)
 
-        if x_pixel == previous_x_pixel and y_pixel == previous_y_pixel:
-            continue
+    used = np.flatnonzero(lows <= highs)
+    pixels = np.empty((2 * len(used), 2), dtype=np.int64)
+    pixels[:, 0] = np.repeat(used + x0, 2)
+    pixels[0::2, 1] = y0 + (lows[used] - miny) / ly * (y1 - y0)
+    pixels[1::2, 1] = y0 + (highs[used] - miny) / ly * (y1 - y0)
+    np.clip(pixels[:, 1], y1, y0, out=pixels[:, 1])
 
-        pygame.draw.circle(surf, point_color, (x_pixel, y_pixel), point_size)
+    if len(pixels):
+        pygame.draw.lines(surf, line_color, False, pixels.tolist(), line_width)
 
 
-def _draw_title(surf, rect, title):
-    text = title_font.render(title, True, title_color)
+def _draw_title(surf, title):
+    text = render_text(title, title_size, title_color)
     text_rect = text.get_rect()
-    text_rect.midtop = (rect.width // 2, 0)
+    text_rect.midtop = (surf.get_width() // 2, 0)
     surf.blit(text, text_rect)
 
 
-def draw_plot(surf: pygame.Surface, rect: pygame.Rect, xs: list, ys: list, title: str):
+def _get_frame(size, p0, p1, title, labels) -> pygame.Surface:
     """
-    Draw a plot with data xs and ys on surface surf in rectangle rect
+    Return the background, axes, ticks and title of a plot, rendered once for a size, a title and tick labels
+    """
+    key = (size, title, labels)
+    frame = _frames.get(key)
+    if frame is None:
+        frame = pygame.Surface(size)
+        frame.fill(background_color)
+        _draw_axis(frame, p0, p1)
+        _draw_title(frame, title)
+        if labels is not None:
+            x_labels, y_labels = labels
+            _draw_x_ticks(frame, p0, (p1[0], p0[1]), x_labels)
+            _draw_y_ticks(frame, p0, (p0[0], p1[1]), y_labels)
+
+        _frames[key] = frame
+        if len(_frames) > max_cached_frames:
+            _frames.popitem(last=False)
+    _frames.move_to_end(key)
+    return frame
+
+
+def draw_plot(surf: pygame.Surface, rect: pygame.Rect, xs: Sequence[float], ys: Sequence[float], title: str,
+              x_range: Tuple[float, float] = None, y_range: Tuple[float, float] = None,
+              ys_max: Sequence[float] = None):
+    """
+    Draw a plot with data xs and ys on surface surf in rectangle rect. Data is drawn as the envelope of its minimum and
+    maximum by column of pixels. The background, axes, ticks and title are rendered once and reused while the size of
+    the plot and the tick labels stay the same.
     :param surf: Surface where the plot will be drawn
     :param rect: rect of the surface corresponding to position and dimension of the plot
     :param xs: x coordinate of ever point of dataset
     :param ys: y coordinate of ever point of dataset
     :param title: String to be shown on top of plot
+    :param x_range: minimum and maximum of xs, computed if not given
+    :param y_range: minimum and maximum of ys, computed if not given
+    :param ys_max: if given, data is made of blocks of values, ys being the minimum and ys_max the maximum of the values
+    of each block
     """
+    if not len(xs):
+        return
 
     plot_surf = surf.subsurface(rect)
     w, h = rect.size
     x0, y0 = int(w * margin_ratio), int(h * (1 - margin_ratio))
     x1, y1 = int(w * (1 - margin_ratio)), int(h * margin_ratio)
-    minx, maxx, miny, maxy = min(xs), max(xs), min(ys), max(ys)
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    ys_max = ys if ys_max is None else np.asarray(ys_max, dtype=float)
+    minx, maxx = x_range or (xs.min(), xs.max())
+    miny, maxy = y_range or (ys.min(), ys_max.max())
     lx, ly = maxx - minx, maxy - miny
 
-    _draw_axis(plot_surf, (x0, y0), (x1, y1))
-    _draw_title(plot_surf, rect, title)
+    labels = None
+    if lx != 0. and ly != 0.:
+        labels = (_get_tick_labels((minx, maxx), n_x_tick), _get_tick_labels((miny, maxy), n_y_tick))
+    plot_surf.blit(_get_frame((w, h), (x0, y0), (x1, y1), title, labels), (0, 0))
 
-    if lx == 0. or ly == 0.:
+    if labels is None:
         return
 
-    _draw_x_ticks(plot_surf, (x0, y0), (x1, y0), (minx, maxx))
-    _draw_y_ticks(plot_surf, (x0, y0), (x0, y1), (miny, maxy))
-    _draw_points(plot_surf, xs, ys, (x0, y0), (x1, y1), minx, miny, lx, ly)
+    _draw_envelope(plot_surf, xs, ys, ys_max, (x0, y0), (x1, y1), minx, miny, lx, ly)
@@ -0,0 +1,247 @@
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+from src.physics.world import World
+
+format_name = "physicshowroom-trajectory"
+format_version = 1
+header_name = "header.json"
+
+columns = ("id", "t", "r", "v", "a", "m")  # columns of the particle rows, t being the living duration of the particle
+
+
+class TrajectoryRecorder:
+    """
+    Class streaming the state of the particles of a world to a directory, one row per particle and recorded step.
+
+    Recorded steps are gathered in chunks, each chunk being a sub-directory with one .npy file per column, which can
+    be memory mapped. The rows of the frames of a chunk are consecutive: frame_offsets gives where the rows of each
+    frame start, and frame_t the time of the world at each frame. The header lists the chunks written so far, so that
+    a recording interrupted by a crash can still be read up to its last chunk.
+
+    Chunks are written by a background thread: recording a step only copies the particle arrays. A chunk is closed
+    once it holds chunk_size steps or max_chunk_bytes bytes, and at most max_pending chunks wait for the writer,
+    beyond which recording blocks until the disk catches up. The memory used by recording is thus bounded by about
+    (max_pending + 3) * max_chunk_bytes: the chunk being filled, the waiting ones, and the one being written which is
+    copied once when its columns are concatenated. A single step larger than max_chunk_bytes makes a chunk of its own.
+    """
+
+    def __init__(self, path: str, every: int = 1, chunk_size: int = 256, max_pending: int = 4,
+                 float_dtype=np.float64, max_chunk_bytes: int = 64 * 2 ** 20):
+        """
+        :param path: directory of the recording, created if needed
+        :param every: number of steps between two recorded steps
+        :param chunk_size: maximum number of recorded steps per chunk
+        :param max_pending: maximum number of chunks waiting to be written
+        :param float_dtype: type of the recorded floats, np.float32 halves the size of a recording
+        :param max_chunk_bytes: maximum size of the steps of a chunk in bytes
+        """
+        self.path = path
+        self.every = every
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.float_dtype = np.dtype(float_dtype)
+
+        self.n_steps = 0  # number of steps seen
+        self.n_frames = 0  # number of steps recorded
+        self.chunks = []  # description of the chunks written
+        self.n_chunks = 0  # number of chunks sent to the writer
+        self.dim = None  # dimension of the recorded world
+
+        self._frames = []  # recorded steps not yet sent to the writer
+        self._n_bytes = 0  # size of the recorded steps not yet sent to the writer
+        self._queue = queue.Queue(max_pending)
+        self._error = None  # exception raised by the writer, raised again by the recorder
+        self._writer = threading.Thread(target=self._write_chunks, daemon=True)
+
+        os.makedirs(path, exist_ok=True)
+        self._writer.start()
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def record(self, world: World) -> None:
+        """ Called after each step of the world, records every few steps the state of its particles """
+        self._raise_writer_error()
+
+        self.n_steps += 1
+        if (self.n_steps - 1) % self.every:
+            return
+
+        self.dim = world.rect.size
+        store = world.store
+        frame = (world.t, store.ids.copy(), store.t.astype(self.float_dtype), store.r.astype(self.float_dtype),
+                 store.v.astype(self.float_dtype), store.a.astype(self.float_dtype), store.m.astype(self.float_dtype))
+        frame_bytes = sum(array.nbytes for array in frame[1:])
+        if self._frames and self._n_bytes + frame_bytes > self.max_chunk_bytes:
+            self.flush()
+
+        self._frames.append(frame)
+        self._n_bytes += frame_bytes
+        self.n_frames += 1
+
+        if len(self._frames) >= self.chunk_size or self._n_bytes >= self.max_chunk_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Send the recorded steps to the writer """
+        if self._frames:
+            name = "chunk_{:06d}".format(self.n_chunks)
+            self._queue.put((name, self._frames))
+            self._frames = []
+            self._n_bytes = 0
+            self.n_chunks += 1
+
+    def close(self) -> None:
+        """ Write the remaining steps and wait for the writer to finish """
+        if not self._writer.is_alive():
+            return
+
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_writer_error()
+        self._write_header()
+
+    def _raise_writer_error(self) -> None:
+        if self._error is not None:
+            raise IOError("Recording to {} failed".format(self.path)) from self._error
+
+    def _write_chunks(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+
+            try:
+                self._write_chunk(*item)
+            except Exception as e:
+                self._error = e
+
+    def _write_chunk(self, name: str, frames: list) -> None:
+        chunk_path = os.path.join(self.path, name)
+        os.makedirs(chunk_path, exist_ok=True)
+
+        frame_t = np.array([frame[0] for frame in frames])
+        frame_offsets = np.concatenate([[0], np.cumsum([len(frame[1]) for frame in frames])]).astype(np.int64)
+        np.save(os.path.join(chunk_path, "frame_t.npy"), frame_t)
+        np.save(os.path.join(chunk_path, "frame_offsets.npy"), frame_offsets)
+        for i, column in enumerate(columns, start=1):
+            np.save(os.path.join(chunk_path, column + ".npy"), np.concatenate([frame[i] for frame in frames]))
+
+        self.chunks.append({"name": name, "n_frames": len(frames), "n_rows": int(frame_offsets[-1]),
+                            "t0": float(frame_t[0]), "t1": float(frame_t[-1])})
+        self._write_header()
+
+    def _write_header(self) -> None:
+        header = {
+            "format": format_name,
+            "version": format_version,
+            "dim": list(self.dim) if self.dim else None,
+            "every": self.every,
+            "float_dtype": self.float_dtype.name,
+            "columns": list(columns),
+            "chunks": self.chunks,
+        }
+        path = os.path.join(self.path, header_name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(header, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+class Frame:
+    """
+    Class representing the state of the particles at a recorded step, each field being an array with one row per
+    particle
+    """
+
+    def __init__(self, t: float, arrays: Dict[str, np.ndarray]):
+        self.t = t  # time of the world
+        self.ids = arrays["id"]
+        self.ages = arrays["t"]  # living durations of the particles
+        self.r = arrays["r"]
+        self.v = arrays["v"]
+        self.a = arrays["a"]
+        self.m = arrays["m"]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class TrajectoryReader:
+    """
+    Class reading a recording written by TrajectoryRecorder. Chunks are memory mapped when first accessed and only
+    the last few ones are kept open, so that frames are loaded lazily and reading uses a constant memory whatever the
+    size of the recording.
+    """
+
+    max_open_chunks = 8
+
+    def __init__(self, path: str):
+        """
+        :param path: directory of the recording
+        """
+        self.path = path
+        with open(os.path.join(path, header_name)) as f:
+            self.header = json.load(f)
+        if self.header.get("format") != format_name:
+            raise ValueError("{} is not a trajectory recording".format(path))
+        if self.header["version"] > format_version:
+            raise ValueError("Recording version {} is not supported, expected at most {}".format(
+                self.header["version"], format_version))
+
+        self.dim = tuple(self.header["dim"]) if self.header["dim"] else None
+        self.chunks: List[dict] = self.header["chunks"]
+        self.chunk_starts = np.concatenate([[0], np.cumsum([c["n_frames"] for c in self.chunks])]).astype(np.int64)
+
+        self._open_chunks = OrderedDict()  # chunk index -> arrays, least recently used first
+
+    def __len__(self):
+        return int(self.chunk_starts[-1])
+
+    @property
+    def duration(self) -> float:
+        return self.chunks[-1]["t1"] - self.chunks[0]["t0"] if self.chunks else 0.
+
+    def frame(self, index: int) -> Frame:
+        """ Return a recorded frame, negative indices counting from the end """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Frame {} out of range".format(index))
+
+        chunk = int(np.searchsorted(self.chunk_starts, index, side="right")) - 1
+        arrays = self._get_chunk(chunk)
+        k = index - self.chunk_starts[chunk]
+        i0, i1 = arrays["frame_offsets"][k], arrays["frame_offsets"][k + 1]
+        return Frame(float(arrays["frame_t"][k]), {column: arrays[column][i0:i1] for column in columns})
+
+    def find(self, t: float) -> int:
+        """ Return the index of the last frame recorded at or before time t, 0 if none """
+        chunk = max(0, int(np.searchsorted([c["t0"] for c in self.chunks], t, side="right")) - 1)
+        frame_t = self._get_chunk(chunk)["frame_t"]
+        k = max(0, int(np.searchsorted(frame_t, t, side="right")) - 1)
+        return int(self.chunk_starts[chunk]) + k
+
+    def _get_chunk(self, chunk: int) -> Dict[str, np.ndarray]:
+        arrays = self._open_chunks.get(chunk)
+        if arrays is None:
+            chunk_path = os.path.join(self.path, self.chunks[chunk]["name"])
+            arrays = {name: np.load(os.path.join(chunk_path, name + ".npy"), mmap_mode="r")
+                      for name in ("frame_t", "frame_offsets") + columns}
+            self._open_chunks[chunk] = arrays
+            while len(self._open_chunks) > TrajectoryReader.max_open_chunks:
+                self._open_chunks.popitem(last=False)
+        self._open_chunks.move_to_end(chunk)
+        return arrays
@@ -0,0 +1,106 @@
+import pygame
+
+from src.physics.world import World
+from src.recording import TrajectoryReader
+from src.simulation import Simulation
+
+
+class ReplayWorld(World):
+    """
+    World playing a recording instead of computing physics: each update moves a playhead through the recording and
+    loads the particles of the frame under it. Frames are read lazily from the memory mapped recording, so that
+    replaying starts instantly and uses a constant memory whatever the length of the recording.
+    """
+
+    def __init__(self, reader: TrajectoryReader, speed: float = 1.):
+        """
+        :param reader: recording to play
+        :param speed: playback speed, 1 being real time. Negative speeds play backwards.
+        """
+        super().__init__(reader.dim or (0, 0))
+        self.reader = reader
+        self.speed = speed
+        self.is_removed_if_out_of_world = False
+
+        self.frame_index = -1  # index of the loaded frame
+        self.playhead = reader.frame(0).t if len(reader) else 0.  # time of the recording being played
+        self.seek(self.playhead)
+
+    @property
+    def start(self) -> float:
+        return self.reader.chunks[0]["t0"] if len(self.reader) else 0.
+
+    @property
+    def end(self) -> float:
+        return self.reader.chunks[-1]["t1"] if len(self.reader) else 0.
+
+    def update(self, dt: float) -> None:
+        """
+        Move the playhead by dt times the playback speed, stopping at both ends of the recording
+        :param dt: elapsed time in seconds
+        """
+        self.seek(self.playhead + dt * self.speed)
+
+    def seek(self, t: float) -> None:
+        """ Move the playhead to time t and load the last frame recorded before it """
+        self.playhead = min(max(t, self.start), self.end)
+        if len(self.reader):
+            self.load_frame(self.reader.find(self.playhead))
+
+    def load_frame(self, index: int) -> None:
+        """ Replace the particles of the world by those of a recorded frame """
+        if index == self.frame_index:
+            return
+
+        frame = self.reader.frame(index)
+        store = self.store
+        store.clear()
+        store.spawn(frame.r, frame.v, frame.m, ids=frame.ids)
+        store.a[:] = frame.a
+        store.t[:] = frame.ages
+        store.is_acceleration_current = True
+
+        self.t = frame.t
+        self.frame_index = index
+
+
+class ReplaySimulation(Simulation):
+    """
+    Class playing a recording in a window. On top of the window controls, LEFT and RIGHT seek one second backward or
+    forward, HOME and END go to the start and the end, PAGE DOWN and PAGE UP halve and double the playback speed and R
+    reverses it.
+    """
+
+    seek_step = 1.
+
+    def __init__(self, path: str, speed: float = 1.):
+        """
+        :param path: directory of the recording
+        :param speed: playback speed, 1 being real time. Negative speeds play backwards.
+        """
+        super().__init__(ReplayWorld(TrajectoryReader(path), speed))
+
+    def advance(self, frame_time: float) -> int:
+        self.world.update(frame_time)
+        return 0
+
+    def _handle_events(self):
+        events = super()._handle_events()
+        world = self.world
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    world.seek(world.playhead - ReplaySimulation.seek_step)
+                if event.key == pygame.K_RIGHT:
+                    world.seek(world.playhead + ReplaySimulation.seek_step)
+                if event.key == pygame.K_HOME:
+                    world.seek(world.start)
+                if event.key == pygame.K_END:
+                    world.seek(world.end)
+                if event.key == pygame.K_PAGEDOWN:
+                    world.speed /= 2
+                if event.key == pygame.K_PAGEUP:
+                    world.speed *= 2
+                if event.key == pygame.K_r:
+                    world.speed = -world.speed
+        return events
@@ -6,20 +6,50 @@ from src.window import Window
 
 
 class Simulation:
-    def __init__(self, world):
+    """
+    Class running a world in a window. The world is evolved with a fixed time step, independent of the frame rate:
+    elapsed time is accumulated and consumed by as many steps as needed before each rendering.
+    """
+
+    def __init__(self, world, dt: float = 1 / 120, max_steps_per_frame: int = 10):
+        """
+        :param world: world to be simulated
+        :param dt: physics time step in seconds
+        :param max_steps_per_frame: maximum number of steps computed before a rendering. Elapsed time beyond it is
+        dropped, so that a slow frame slows down the simulation instead of making it spiral behind real time.
+        """
         self.world = world
         self.viewer = Window()
         self.is_paused = False
 
+        self.dt = dt
+        self.max_steps_per_frame = max_steps_per_frame
+        self.accumulator = 0.  # elapsed time not yet consumed by physics steps
+
     def run(self):
         clock = pygame.time.Clock()
         while True:
 
-            dt = clock.tick() / 1000  # ellapsed time in seconds
+            frame_time = clock.tick() / 1000  # ellapsed time in seconds
             if not self.is_paused:
-                self.world.update(dt)
+                self.advance(frame_time)
             events = self._handle_events()
-            self.viewer.update(self.world, events)
+            self.viewer.update(self.world, events, self.accumulator / self.dt)
+
+    def advance(self, frame_time: float) -> int:
+        """
+        Consume elapsed time with fixed physics steps
+        :param frame_time: time elapsed since the previous call in seconds
+        :return: number of steps computed
+        """
+        self.accumulator = min(self.accumulator + frame_time, self.max_steps_per_frame * self.dt)
+
+        n_steps = 0
+        while self.accumulator >= self.dt:
+            self.world.update(self.dt)
+            self.accumulator -= self.dt
+            n_steps += 1
+        return n_steps
 
     def _handle_events(self):
         events = []
@@ -1,14 +1,16 @@
 import sys
-from collections import deque
+from collections import OrderedDict
 from enum import Enum
 from typing import Tuple
 
+import numpy as np
 import pygame
 from pygame.rect import Rect
 
-from src.mathematics import Vector
+from src.mathematics import Vector, epsilon
+from src.history import History
 from src.physics.world import World
-from src.plot import draw_plot
+from src.plot import draw_plot, render_text
 
 
 class ParticleKinematic:
@@ -46,117 +48,201 @@ class Entity:
         self.kin = kin
 
     def __repr__(self):
-        return self.type.name
+        return self.type.name if self.type == EntityType.World else "{} {}".format(self.type.name, self.id)
+
+
+class EntityList:
+    """
+    Class giving the entities of a world as a sequence, the world first then its particles in the order of its store.
+    Entities are built from the arrays of the store when accessed, so that only the shown ones cost anything.
+    """
+
+    def __init__(self, world: World):
+        self.world = world
+
+    def __len__(self):
+        return len(self.world.store) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Entity {} out of range".format(index))
+
+        world = self.world
+        if index == 0:
+            return Entity(world.id, EntityType.World,
+                          ParticleKinematic(world.t, 0., Vector(world.rect.w // 2, world.rect.h // 2)))
+
+        store, row = world.store, index - 1
+        return Entity(int(store.ids[row]), EntityType.Particle,
+                      ParticleKinematic(float(store.t[row]), float(store.m[row]), Vector(*store.r[row].tolist()),
+                                        Vector(*store.v[row].tolist()), Vector(*store.a[row].tolist())))
+
+    def index(self, id) -> int:
+        """ Return the index of the entity with the given id, raise ValueError if none """
+        if id == self.world.id:
+            return 0
+        try:
+            return self.world.store.row_of_id(id) + 1
+        except KeyError:
+            raise ValueError("No entity with id {}".format(id)) from None
 
 
 class Plotter:
     """
-    Class that show information on entities with different plots
+    Class that show information on entities with different plots. History is only recorded for the selected entity
+    and the pinned ones, least recently used histories being dropped beyond a memory budget. Histories span the whole
+    run: the last values at full resolution, older ones as the extrema of coarser and coarser blocks, so that plots
+    draw about one block per pixel whatever the length of the run.
     """
-    text_width = 40
-    font = pygame.font.SysFont("comicsansms", 8)
-    queue_size = 1000
+    text_width = 80
+    font_size = 8
+    row_height = 8  # height of a row of the entity list
+    queue_size = 1000  # values kept at full resolution, and blocks kept by each coarser level
     point_to_skip = 0
+    memory_budget = 64 * 2 ** 20  # bytes of history kept at most
+
+    particle_quantities = ("ts", "xs", "ys", "vxs", "vys", "axs", "ays")
+    world_quantities = ("ts", "Es", "pxs", "pys")
 
     def __init__(self, surf: pygame.Surface):
         self.surf = surf
-        self.entity_dict = {}
+        self.histories = OrderedDict()  # history of each tracked entity by id, least recently used first
+        self.pinned = set()  # ids of the entities whose history is recorded even when not selected
+        self.first_row = 0  # index of the first entity shown in the list
         self.reference = (0, 0)
 
         self.skipped_points = -1
-        self.fill_functions = {
-            EntityType.World: self._fill_world_data,
-            EntityType.Particle: self._fill_particle_data,
-        }
         self.plot_functions = {
             EntityType.World: self._draw_world_plots,
             EntityType.Particle: self._draw_particle_plots,
         }
 
-    def update(self, entities, observer: Entity):
+    def pin(self, id) -> None:
+        """ Record the history of an entity even when it is not selected """
+        self.pinned.add(id)
+
+    def unpin(self, id) -> None:
+        self.pinned.discard(id)
+
+    def update(self, world: World, observer: Entity, selected: Entity = None):
+        """
+        Record the state of the tracked entities, read from the arrays of the world so that the cost does not depend
+        on the number of particles beyond a few vectorized operations
+        :param world: world of the entities
+        :param observer: entity the quantities are relative to
+        :param selected: entity selected in the window
+        """
         if 0 <= self.skipped_points < Plotter.point_to_skip:
             self.skipped_points += 1
             return
 
         self.skipped_points = 0
 
-        for e in entities:
-            self.fill_functions[e.type](e, observer, entities)
-
-    def _fill_particle_data(self, e: Entity, observer: Entity, entities):
-        if e.id not in self.entity_dict:
-            self.entity_dict[e.id] = {
-                "ts": deque(maxlen=Plotter.queue_size),
-                "xs": deque(maxlen=Plotter.queue_size),
-                "ys": deque(maxlen=Plotter.queue_size),
-                "vys": deque(maxlen=Plotter.queue_size),
-                "axs": deque(maxlen=Plotter.queue_size),
-                "ays": deque(maxlen=Plotter.queue_size),
-                "vxs": deque(maxlen=Plotter.queue_size),
-            }
-
-        self.entity_dict[e.id]["ts"].append(e.kin.t)
-        self.entity_dict[e.id]["xs"].append(e.kin.r.x - observer.kin.r.x)
-        self.entity_dict[e.id]["ys"].append(e.kin.r.y - observer.kin.r.y)
-        self.entity_dict[e.id]["vxs"].append(e.kin.v.x - observer.kin.v.x)
-        self.entity_dict[e.id]["vys"].append(e.kin.v.y - observer.kin.v.y)
-        self.entity_dict[e.id]["axs"].append(e.kin.a.x - observer.kin.a.x)
-        self.entity_dict[e.id]["ays"].append(e.kin.a.y - observer.kin.a.y)
-
-    def _fill_world_data(self, world: Entity, observer: Entity, entities):
-        if world.id not in self.entity_dict:
-            self.entity_dict[world.id] = {
-                "ts": deque(maxlen=Plotter.queue_size),
-                "pxs": deque(maxlen=Plotter.queue_size),
-                "pys": deque(maxlen=Plotter.queue_size),
-                "Es": deque(maxlen=Plotter.queue_size)
-            }
-        E = 0
-        p = Vector()
-        for e in entities:
-            if e.type != EntityType.Particle:
-                continue
-
-            v = (e.kin.v - observer.kin.v)
-            E += 0.5 * e.kin.m * v.length() ** 2
-            p += v * e.kin.m
-
-        self.entity_dict[world.id]["ts"].append(world.kin.t)
-        self.entity_dict[world.id]["Es"].append(E)
-        self.entity_dict[world.id]["pxs"].append(p.x)
-        self.entity_dict[world.id]["pys"].append(p.y)
-
-    def draw(self, selected: Entity, entities):
+        tracked = self.pinned if selected is None else self.pinned | {selected.id}
+        if not tracked:
+            return
+
+        if world.id in tracked:
+            self._fill_world_data(world, observer)
+
+        particle_ids = [id for id in tracked if id != world.id]
+        if particle_ids:
+            for row in np.flatnonzero(np.isin(world.store.ids, particle_ids)).tolist():
+                self._fill_particle_data(world.store, row, observer)
+
+    def _get_history(self, id, quantities) -> History:
+        history = self.histories.get(id)
+        if history is None:
+            history = History(quantities, Plotter.queue_size)
+            self.histories[id] = history
+            self._evict()
+        self.histories.move_to_end(id)
+        return history
+
+    def _evict(self) -> None:
+        """ Drop the least recently used histories of entities not pinned until the memory budget is respected """
+        n_bytes = sum(h.max_nbytes for h in self.histories.values())
+        for id in list(self.histories)[:-1]:
+            if n_bytes <= Plotter.memory_budget:
+                return
+            if id not in self.pinned:
+                n_bytes -= self.histories.pop(id).max_nbytes
+
+    def _fill_particle_data(self, store, row: int, observer: Entity):
+        (x, y), (vx, vy), (ax, ay) = store.r[row].tolist(), store.v[row].tolist(), store.a[row].tolist()
+        self._get_history(int(store.ids[row]), Plotter.particle_quantities).append({
+            "ts": float(store.t[row]),
+            "xs": x - observer.kin.r.x,
+            "ys": y - observer.kin.r.y,
+            "vxs": vx - observer.kin.v.x,
+            "vys": vy - observer.kin.v.y,
+            "axs": ax - observer.kin.a.x,
+            "ays": ay - observer.kin.a.y,
+        })
+
+    def _fill_world_data(self, world: World, observer: Entity):
+        m = world.store.m
+        v = world.store.v - (observer.kin.v.x, observer.kin.v.y)
+        px, py = (m[:, np.newaxis] * v).sum(axis=0).tolist()
+
+        self._get_history(world.id, Plotter.world_quantities).append({
+            "ts": world.t,
+            "Es": float(0.5 * (m * (v ** 2).sum(axis=1)).sum()),
+            "pxs": px,
+            "pys": py,
+        })
+
+    @property
+    def n_visible_rows(self) -> int:
+        """ Number of entities shown at once in the list """
+        return max(1, self.surf.get_height() // Plotter.row_height)
+
+    def draw(self, entities, selected_index: int):
+        """
+        Draw the list of entities and the plots of the selected one. Only the rows of the list visible around the
+        selection are rendered, so that drawing does not depend on the number of entities.
+        :param entities: entities of the world
+        :param selected_index: index of the selected entity in entities
+        """
         self.surf.fill((0, 0, 0))
 
-        self._draw_selected_highlight(selected, entities)
+        self._scroll_to(selected_index, len(entities))
+        self._draw_selected_highlight(entities, selected_index)
         self._draw_entities_names(entities)
-        self._draw_plots(selected)
+        self._draw_plots(entities[selected_index])
 
         pygame.draw.rect(self.surf, (128, 0, 0), self.surf.get_rect(), 3)
 
     def reset(self):
-        self.entity_dict = {}
-
-    def _draw_selected_highlight(self, selected, entities):
-        index = 0
-        for i, p in enumerate(entities):
-            if p.id == selected.id:
-                index = i
-                break
-
-        text = Plotter.font.render(repr(entities[index]), True, (255, 255, 255))
+        self.histories = OrderedDict()
+
+    def _scroll_to(self, index: int, n_entities: int) -> None:
+        """ Scroll the list as little as possible for the entity of the given index to be visible """
+        n_rows = self.n_visible_rows
+        if index < self.first_row:
+            self.first_row = index
+        elif index >= self.first_row + n_rows:
+            self.first_row = index - n_rows + 1
+        self.first_row = max(0, min(self.first_row, n_entities - n_rows))
+
+    def _draw_selected_highlight(self, entities, selected_index):
+        text = render_text(repr(entities[selected_index]), Plotter.font_size, (255, 255, 255))
         rect = text.get_rect()
-        rect.top += 8 * index
+        rect.top += Plotter.row_height * (selected_index - self.first_row)
         rect.left = 5
         pygame.draw.rect(self.surf, (128, 128, 128), rect)
 
     def _draw_entities_names(self, entities):
         h = 0
-        for e in entities:
-            text = Plotter.font.render(repr(e), True, (255, 255, 255))
+        for e in entities[self.first_row:self.first_row + self.n_visible_rows]:
+            text = render_text(repr(e), Plotter.font_size, (255, 255, 255))
             self.surf.blit(text, (5, h))
-            h += 8
+            h += Plotter.row_height
 
     def _draw_plots(self, selected):
         self.plot_functions[selected.type](selected)
@@ -165,56 +251,55 @@ class Plotter:
         width, height = self.surf.get_rect().size
         plot_width = width - Plotter.text_width
 
-        id = selected.id
-
-        if id not in self.entity_dict:
+        history = self.histories.get(selected.id)
+        if history is None:
             return
 
-        ts = self.entity_dict[id]["ts"]
-        xs = self.entity_dict[id]["xs"]
-        ys = self.entity_dict[id]["ys"]
-        vxs = self.entity_dict[id]["vxs"]
-        vys = self.entity_dict[id]["vys"]
-        axs = self.entity_dict[id]["axs"]
-        ays = self.entity_dict[id]["ays"]
-
         p_x0 = Plotter.text_width
         p_x1 = p_x0 + (plot_width // 2)
         p_w = plot_width // 2
         p_h = height // 3
 
-        draw_plot(self.surf, pygame.Rect(p_x0, 0, p_w, p_h), ts, xs, "x over time")
-        draw_plot(self.surf, pygame.Rect(p_x1, 0, p_w, p_h), ts, ys, "y over time")
-        draw_plot(self.surf, pygame.Rect(p_x0, p_h, p_w, p_h), ts, vxs, "Vx over time")
-        draw_plot(self.surf, pygame.Rect(p_x1, p_h, p_w, p_h), ts, vys, "Vy over time")
-        draw_plot(self.surf, pygame.Rect(p_x0, p_h * 2, p_w, p_h), ts, axs, "Ax over time")
-        draw_plot(self.surf, pygame.Rect(p_x1, p_h * 2, p_w, p_h), ts, ays, "Ay over time")
+        self._draw_plot(pygame.Rect(p_x0, 0, p_w, p_h), history, "xs", "x over time")
+        self._draw_plot(pygame.Rect(p_x1, 0, p_w, p_h), history, "ys", "y over time")
+        self._draw_plot(pygame.Rect(p_x0, p_h, p_w, p_h), history, "vxs", "Vx over time")
+        self._draw_plot(pygame.Rect(p_x1, p_h, p_w, p_h), history, "vys", "Vy over time")
+        self._draw_plot(pygame.Rect(p_x0, p_h * 2, p_w, p_h), history, "axs", "Ax over time")
+        self._draw_plot(pygame.Rect(p_x1, p_h * 2, p_w, p_h), history, "ays", "Ay over time")
 
     def _draw_world_plots(self, selected):
         width, height = self.surf.get_rect().size
         plot_width = width - Plotter.text_width
 
-        id = selected.id
-        ts = self.entity_dict[id]["ts"]
-        Es = self.entity_dict[id]["Es"]
-        pxs = self.entity_dict[id]["pxs"]
-        pys = self.entity_dict[id]["pys"]
+        history = self.histories.get(selected.id)
+        if history is None:
+            return
 
         p_x0 = Plotter.text_width
         p_x1 = p_x0 + (plot_width // 2)
         p_w = plot_width // 2
         p_h = height // 3
 
-        draw_plot(self.surf, pygame.Rect(p_x0, 0, p_w * 2, p_h), ts, Es, "E over time")
-        draw_plot(self.surf, pygame.Rect(p_x0, p_h, p_w, p_h), ts, pxs, "px over time")
-        draw_plot(self.surf, pygame.Rect(p_x1, p_h, p_w, p_h), ts, pys, "py over time")
+        self._draw_plot(pygame.Rect(p_x0, 0, p_w * 2, p_h), history, "Es", "E over time")
+        self._draw_plot(pygame.Rect(p_x0, p_h, p_w, p_h), history, "pxs", "px over time")
+        self._draw_plot(pygame.Rect(p_x1, p_h, p_w, p_h), history, "pys", "py over time")
+
+    def _draw_plot(self, rect: pygame.Rect, history: History, name: str, title: str):
+        """
+        Draw a quantity of a history over time, each block of the history being drawn as its minimum and maximum at
+        its middle time
+        """
+        t_min, t_max = history["ts"].envelope(rect.w)
+        y_min, y_max = history[name].envelope(rect.w)
+        draw_plot(self.surf, rect, (t_min + t_max) / 2, y_min, title, history.range("ts"), history.range(name), y_max)
 
 
 class Viewer:
     """
     Class giving a view of the world
     """
-    font = pygame.font.SysFont("comicsansms", 8)
+    font_size = 8
+    radiance_every = 30  # frames between two readings of the radiance of the world
 
     def __init__(self, surf: pygame.Surface, window):
         self.surf = surf
@@ -226,19 +311,31 @@ class Viewer:
         self.world_shift = (0, 0)  # shift between the center of the view and the origin of the world
         self.world_scale = 1  # n_pixel = world_length * world_scale
 
-    def draw(self, world, observer: Entity, selected: Entity) -> None:
+        self.positions = {}  # drawn position of each particle, by id
+
+        self._radiance_colors = None  # colors of the cells of the radiance grid, indexed by [iy, ix]
+        self._radiance_grid_id = None  # grid the colors were computed from
+        self._radiance_age = 0  # number of frames the colors were drawn since computed
+
+    def draw(self, world, observer: Entity, selected: Entity, alpha: float = 1.) -> None:
         """
         Draw the view of the world
         :param selected:
         :param world: world to be drawn
         :param observer :
+        :param alpha: fraction of a physics step elapsed since the last one, particles are drawn interpolated between
+        their two last positions
         """
 
         self.surf.fill((0, 0, 0))
 
+        positions = world.store.interpolated_r(alpha)
+        self.positions = {i: (x, y) for i, (x, y) in zip(world.store.ids.tolist(), positions.tolist())}
+
         if observer.type != EntityType.World:
-            self.world_shift = observer.kin.r
+            self.world_shift = self._get_position(observer)
 
+        self._draw_radiance(world)
         self._draw_selected_highlight(selected, world)
         self._draw_world_rectangle(world)
         self._draw_reference_axis(observer, world)
@@ -266,14 +363,26 @@ class Viewer:
         wx, wy = world_r[0], world_dim[1] - world_r[1]
         return ox + self._world_to_pixel_len(wx) - owx, oy + self._world_to_pixel_len(wy) - owy
 
+    def _world_to_pixel_positions(self, world_r: np.ndarray, world_dim: Tuple[int, int]) -> np.ndarray:
+        """ Same as _world_to_pixel_pos for an array of positions of shape (n, 2) """
+        ox, oy = self.origin
+        owx = self._world_to_pixel_len(self.world_shift[0])
+        owy = self._world_to_pixel_len(world_dim[1] - self.world_shift[1])
+        wx = (self.world_scale * world_r[:, 0]).astype(np.int64)
+        wy = (self.world_scale * (world_dim[1] - world_r[:, 1])).astype(np.int64)
+        return np.stack([ox + wx - owx, oy + wy - owy], axis=1)
+
     def _world_to_pixel_len(self, world_len):
         return int(self.world_scale * world_len)
 
     def _pixel_to_world_len(self, pixel_len):
         return int(pixel_len / self.world_scale)
 
+    def _get_position(self, entity: Entity) -> Tuple[float, float]:
+        return self.positions.get(entity.id, (entity.kin.r.x, entity.kin.r.y))
+
     def _draw_selected_highlight(self, observer, world):
-        r = self._world_to_pixel_pos(observer.kin.r, world.rect.size)
+        r = self._world_to_pixel_pos(self._get_position(observer), world.rect.size)
         pygame.draw.circle(self.surf, (255, 255, 255), r, 6)
 
     def _draw_world_rectangle(self, world):
@@ -281,27 +390,57 @@ class Viewer:
         w, h = self._world_to_pixel_len(world.rect.w), self._world_to_pixel_len(world.rect.h)
         pygame.draw.rect(self.surf, (0, 128, 128), pygame.Rect(x, y - h, w, h), 3)
 
+    def _draw_radiance(self, world):
+        grid = world.radiance_grid
+        if grid is None:
+            return
+
+        # the radiance is accumulated again every few frames only, as it costs far more than drawing
+        if self._radiance_colors is None or self._radiance_grid_id != id(grid) or \
+                self._radiance_age >= Viewer.radiance_every:
+            intensity = world.radiance.intensity
+            # log scale, so that dim regions remain visible next to the emitters, with a black-red-yellow-white colormap
+            level = np.log1p(intensity / max(intensity.mean(), epsilon))
+            level /= max(level.max(), epsilon)
+            colors = np.clip(np.stack([3 * level, 3 * level - 1, 3 * level - 2], axis=-1), 0., 1.) * 255
+            self._radiance_colors = colors.astype(np.uint8)
+            self._radiance_grid_id = id(grid)
+            self._radiance_age = 0
+        self._radiance_age += 1
+
+        # only the pixels of the view are computed, each taking the color of the cell under it, so that the cost does
+        # not grow with the zoom
+        x, y = self._world_to_pixel_pos((0, 0), world.rect.size)
+        w, h = self._world_to_pixel_len(world.rect.w), self._world_to_pixel_len(world.rect.h)
+        sw, sh = self.surf.get_size()
+        x0, x1, y0, y1 = max(x, 0), min(x + w, sw), max(y - h, 0), min(y, sh)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        ix = (np.arange(x0, x1) - x) * grid.nx // w
+        iy = grid.ny - 1 - (np.arange(y0, y1) - (y - h)) * grid.ny // h
+        pixels = self._radiance_colors[iy[np.newaxis, :], ix[:, np.newaxis]]
+        self.surf.blit(pygame.surfarray.make_surface(pixels), (x0, y0))
+
     def _draw_reference_axis(self, observer, world):
-        x, y = self._world_to_pixel_pos(observer.kin.r, world.rect.size)
+        x, y = self._world_to_pixel_pos(self._get_position(observer), world.rect.size)
         pygame.draw.line(self.surf, (255, 255, 255), (x, y), (x + 10, y))
         pygame.draw.line(self.surf, (255, 255, 255), (x, y), (x, y + 10))
-        text = Viewer.font.render("{:.2f}".format(10 / self.world_scale), True, (255, 255, 255))
+        label = "{:.2f}".format(10 / self.world_scale)
+        text = render_text(label, Viewer.font_size, (255, 255, 255))
         self.surf.blit(text, (x, y))
 
     def _draw_rays(self, world, observer):
-        for ray in world.rays:
-            for s in ray.segments():
-                x0, y0 = s.p0
-                x1, y1 = s.p1
-                r0 = self._world_to_pixel_pos((x0, y0), world.rect.size)
-                r1 = self._world_to_pixel_pos((x1, y1), world.rect.size)
-                r0 = int(r0[0]), int(r0[1])
-                r1 = int(r1[0]), int(r1[1])
-                pygame.draw.line(self.surf, (255, 255, 255), r0, r1, 1)
+        rays = world.rays
+        pixels = self._world_to_pixel_positions(rays.points, world.rect.size).tolist()
+        offsets = rays.offsets.tolist()
+        for i0, i1 in zip(offsets[:-1], offsets[1:]):
+            if i1 - i0 >= 2:
+                pygame.draw.lines(self.surf, (255, 255, 255), False, pixels[i0:i1], 1)
 
     def _draw_particles(self, world, observer):
         for p in world.particles:
-            r = self._world_to_pixel_pos(p.r, world.rect.size)
+            r = self._world_to_pixel_pos(self.positions[p.id], world.rect.size)
             r = int(r[0]), int(r[1])
             v = self._world_to_pixel_len(p.v.x - observer.kin.v.x), self._world_to_pixel_len(p.v.y - observer.kin.v.y)
             v = int(v[0]), int(v[1])
@@ -331,6 +470,9 @@ class Viewer:
 class Window:
     """
     Classe representing the window which will be a top container of shown elements.
+
+    UP and DOWN select the previous and next entity, with SHIFT they move by a page of the entity list. Typing the id
+    of an entity then RETURN selects it.
     """
 
     viewer_ratio_rect = ((0., 0.), (0.5, 1.))
@@ -345,30 +487,44 @@ class Window:
         self.viewer = Viewer(self._get_subsurface(Window.viewer_ratio_rect), self)
         self.plotter = Plotter(self._get_subsurface(Window.plotter_ratio_rect))
 
-        self.selected_entity_index = 0
-        self.reference_entity_index = 0
+        # the selected and reference entities are followed by id, the world if None or once they left the world
+        self.selected_entity_id = None
+        self.reference_entity_id = None
+        self.selected_entity_index = 0  # index of the selected entity in entities, resolved from its id every frame
         self.entities = []
+        self.typed_id = ""  # id being typed to jump to an entity
 
         self.previous_world_t = -1.
 
-    def update(self, world: World, events):
-        """ Update the visible elements with the given world """
+    def update(self, world: World, events, alpha: float = 1.):
+        """
+        Update the visible elements with the given world
+        :param world: world to be shown
+        :param events: pygame events of the frame
+        :param alpha: fraction of a physics step elapsed since the last one, used to interpolate drawn positions
+        """
 
         is_world_updated = self.previous_world_t != world.t
+        if world.t < self.previous_world_t:
+            self.plotter.reset()  # time went back, e.g. when replaying a recording backward
         if is_world_updated:
             self.previous_world_t = world.t
 
-        self._handle_events(events)
-
         self.entities = self._get_entities(world)
+        self.selected_entity_index = self._find_entity(self.selected_entity_id)
+        self._handle_events(events)
 
-        self.selected_entity_index %= len(self.entities)
+        self.selected_entity_index = self._find_entity(self.selected_entity_id)
         selected_entity = self.entities[self.selected_entity_index]
-        reference_entity = self.entities[self.reference_entity_index]
-        self.viewer.draw(world, reference_entity, selected_entity)
+        reference_entity = self.entities[self._find_entity(self.reference_entity_id)]
+        self.selected_entity_id, self.reference_entity_id = selected_entity.id, reference_entity.id
+        self.viewer.draw(world, reference_entity, selected_entity, alpha)
 
-        if is_world_updated: self.plotter.update(self.entities, reference_entity)
-        self.plotter.draw(selected_entity, self.entities)
+        if is_world_updated: self.plotter.update(world, reference_entity, selected_entity)
+        self.plotter.draw(self.entities, self.selected_entity_index)
+        if self.typed_id:
+            self.plotter.surf.blit(render_text("#" + self.typed_id, Plotter.font_size, (255, 255, 0)),
+                                   (5, self.plotter.surf.get_height() - 2 * Plotter.row_height))
 
         pygame.display.flip()
 
@@ -383,15 +539,42 @@ class Window:
                     sys.exit()
 
                 if event.key == pygame.K_DOWN:
-                    self.selected_entity_index += 1
+                    if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                        self._select(min(self.selected_entity_index + self.plotter.n_visible_rows,
+                                         len(self.entities) - 1))
+                    else:
+                        self._select(self.selected_entity_index + 1)
 
                 if event.key == pygame.K_UP:
-                    self.selected_entity_index -= 1
+                    if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                        self._select(max(self.selected_entity_index - self.plotter.n_visible_rows, 0))
+                    else:
+                        self._select(self.selected_entity_index - 1)
+
+                if pygame.K_0 <= event.key <= pygame.K_9:
+                    self.typed_id += str(event.key - pygame.K_0)
+
+                if event.key == pygame.K_BACKSPACE:
+                    self.typed_id = self.typed_id[:-1]
+
+                if event.key == pygame.K_RETURN and self.typed_id:
+                    try:
+                        self._select(self.entities.index(int(self.typed_id)))
+                    except ValueError:
+                        pass
+                    self.typed_id = ""
 
                 if event.key == pygame.K_SPACE:
-                    self.reference_entity_index = self.selected_entity_index
+                    self.reference_entity_id = self.selected_entity_id
                     self.plotter.reset()
 
+                if event.key == pygame.K_p:
+                    selected_id = self.entities[self.selected_entity_index].id
+                    if selected_id in self.plotter.pinned:
+                        self.plotter.unpin(selected_id)
+                    else:
+                        self.plotter.pin(selected_id)
+
                 if event.key == pygame.K_KP_PLUS:
                     self.viewer.increase_scale()
 
@@ -406,6 +589,18 @@ class Window:
                 if event.button == 5:
                     self.viewer.decrease_scale()
 
+    def _find_entity(self, id) -> int:
+        """ Return the index of the entity with the given id in entities, 0, the world, if it is not in the world """
+        try:
+            return self.entities.index(id)
+        except ValueError:
+            return 0
+
+    def _select(self, index: int) -> None:
+        """ Select the entity of the given index in entities, wrapping around the ends """
+        self.selected_entity_index = index % len(self.entities)
+        self.selected_entity_id = self.entities[self.selected_entity_index].id
+
     def _get_subsurface(self, ratio_rect: Tuple[Tuple[float, float], Tuple[float, float]]):
         rect_surf = self.surf.get_rect()
 
@@ -417,15 +612,5 @@ class Window:
 
         return self.surf.subsurface(rect_sub_surf)
 
-    def _get_entities(self, world):
-
-        entities = [
-            Entity(world.id,
-                   EntityType.World,
-                   ParticleKinematic(world.t, 0., Vector(world.rect.w // 2, world.rect.h // 2))
-                   )
-        ]
-
-        for p in world.particles:
-            entities.append(Entity(p.id, EntityType.Particle, ParticleKinematic(p.t, p.m, p.r, p.v, p.a)))
-        return entities
+    def _get_entities(self, world) -> EntityList:
+        return EntityList(world)
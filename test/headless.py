@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+
+from src.headless import HeadlessSimulation
+from src.mathematics import Vector
+from src.physics.integrators import VelocityVerlet
+from src.physics.mechanics import CentralForce, Particle
+from src.physics.world import World
+
+w = World((2000, 2000), VelocityVerlet())
+c = Vector(w.rect.w // 2, w.rect.h // 2)
+w.forces.append(CentralForce(c, 10000.))
+
+n_particles = 50
+vmax = 100
+for _ in range(n_particles):
+    pos = random.randint(0, w.rect.w), random.randint(0, w.rect.h)
+    s = random.uniform(-vmax, vmax), random.uniform(-vmax, vmax)
+    m = 1.
+    w.add_particle(Particle(Vector(pos[0], pos[1]), Vector(s[0], s[1]), m))
+
+
+def sample(world: World):
+    store = world.store
+    kinetic_energy = 0.5 * float(np.sum(store.m * np.einsum("ij,ij->i", store.v, store.v)))
+    return world.t, len(store), kinetic_energy
+
+
+for t, n, e in HeadlessSimulation(w).run(duration=5., callback=sample, sample_every=60):
+    print("t = {:5.2f} s  n = {:4d}  Ek = {:.1f}".format(t, n, e))
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+import numpy as np
+
+from src.headless import HeadlessSimulation
+from src.mathematics import Vector
+from src.physics.mechanics import CentralForce
+from src.physics.world import World
+from src.recording import TrajectoryRecorder
+from src.replay import ReplaySimulation
+
+path = os.path.join(tempfile.gettempdir(), "physicshowroom_replay")
+
+w = World((2000, 2000))
+w.forces.append(CentralForce(Vector(w.rect.w // 2, w.rect.h // 2), 10000.))
+rng = np.random.default_rng(0)
+w.spawn(rng.uniform(0, w.rect.w, (20, 2)), rng.uniform(-100, 100, (20, 2)))
+
+with TrajectoryRecorder(path) as recorder:
+    w.recorders.append(recorder)
+    HeadlessSimulation(w).run(duration=60.)
+
+ReplaySimulation(path).run()